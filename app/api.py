@@ -2,8 +2,10 @@ from fastapi import APIRouter
 from app.modules.auth.endpoints import router as auth_router
 from app.modules.departments.endpoints import router as departments_router
 from app.modules.documents.endpoints import router as documents_router
+from app.modules.system.endpoints import router as system_router
 
 api_router = APIRouter()
 api_router.include_router(auth_router, prefix="/auth", tags=["Auth"])
 api_router.include_router(departments_router, prefix="/departments", tags=["Departments"])
 api_router.include_router(documents_router)
+api_router.include_router(system_router, prefix="/system", tags=["System"])
\ No newline at end of file
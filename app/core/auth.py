@@ -1,3 +1,4 @@
+import os
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from authlib.jose import jwt
@@ -5,6 +6,14 @@ from app.db.debs import get_db
 from app.modules.users.model import User
 from sqlalchemy import select
 from  .jwt.verifier import verify_token
+from .principal import Principal
+from .revocation import is_token_revoked, token_issued_at_ms
+from .principal_cache import principal_cache
+from .permission_matrix import get_permission_matrix, get_group_departments
+from app.modules.auth.repository import get_user_grants
+
+# "database" authorizes from DB grants (cached per worker), "claims" trusts the signed token claims
+AUTH_MODE = os.getenv("AUTH_MODE", "database").lower()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -15,7 +24,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     except Exception:
         raise HTTPException(401, "Invalid token")
 
+    if AUTH_MODE == "claims":
+        if is_token_revoked(user_id, token_issued_at_ms(payload)):
+            raise HTTPException(401, "Token revoked")
+        return Principal.from_claims(payload, get_permission_matrix(), await get_group_departments(db))
+
+    # Database mode: the user row and grants are authoritative, cached until invalidated
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    generation = principal_cache.generation
     user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(401)
-    return user
+
+    grants = await get_user_grants(db, user.id)
+    principal = Principal.from_user(user, grants, get_permission_matrix(), await get_group_departments(db))
+    principal_cache.put(user_id, principal, generation)
+    return principal
@@ -0,0 +1,57 @@
+# Pick Argon2 parameters for this host.
+#
+#   python -m app.core.calibrate_password_hash --target-ms 250 --max-memory-mib 64 --concurrency 4
+#
+# memory_cost is taken as large as the memory budget allows (budget / concurrency),
+# then time_cost is raised until one hash reaches the target latency.
+import argparse, os, time
+from argon2 import PasswordHasher
+
+SAMPLES = 3
+
+
+def _measure(time_cost: int, memory_cost: int, parallelism: int) -> float:
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism, hash_len=32, salt_len=16)
+    hasher.hash("calibration-password")
+    start = time.perf_counter()
+    for _ in range(SAMPLES):
+        hasher.hash("calibration-password")
+    return (time.perf_counter() - start) / SAMPLES * 1000
+
+
+def calibrate(target_ms: float, max_memory_mib: int, concurrency: int, parallelism: int):
+    # Argon2 memory_cost is in KiB; every concurrent hash holds its own block
+    memory_cost = max(8 * parallelism, (max_memory_mib * 1024) // max(1, concurrency))
+
+    time_cost, elapsed = 1, _measure(1, memory_cost, parallelism)
+    while elapsed < target_ms and time_cost < 50:
+        time_cost += 1
+        elapsed = _measure(time_cost, memory_cost, parallelism)
+
+    # Step back if overshooting the target by more than the last step
+    if time_cost > 1 and elapsed > target_ms * 1.5:
+        time_cost -= 1
+        elapsed = _measure(time_cost, memory_cost, parallelism)
+
+    return {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism, "latency_ms": round(elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate Argon2 password hashing cost")
+    parser.add_argument("--target-ms", type=float, default=250, help="target latency of one hash")
+    parser.add_argument("--max-memory-mib", type=int, default=256, help="memory budget for all concurrent hashes")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("PASSWORD_HASH_CONCURRENCY", min(4, os.cpu_count() or 1))))
+    parser.add_argument("--parallelism", type=int, default=int(os.getenv("PASSWORD_PARALLELISM", 4)))
+    args = parser.parse_args()
+
+    result = calibrate(args.target_ms, args.max_memory_mib, args.concurrency, args.parallelism)
+
+    print(f"# one hash: {result['latency_ms']} ms, {result['memory_cost'] // 1024} MiB; {args.concurrency} concurrent")
+    print(f"PASSWORD_TIME_COST={result['time_cost']}")
+    print(f"PASSWORD_MEMORY_COST={result['memory_cost']}")
+    print(f"PASSWORD_PARALLELISM={result['parallelism']}")
+    print(f"PASSWORD_HASH_CONCURRENCY={args.concurrency}")
+
+
+if __name__ == "__main__":
+    main()
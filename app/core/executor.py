@@ -0,0 +1,56 @@
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
+from app.core import metrics
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+# Thread pool with a concurrency cap and a bounded wait queue
+class BoundedExecutor:
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+
+    # Method to run a blocking callable off the event loop, failing fast when saturated
+    async def run(self, fn, *args):
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            metrics.incr(f"{self.name}.rejected")
+            raise ExecutorSaturated(self.name)
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        metrics.set_gauge(f"{self.name}.queue_depth", self._waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+            metrics.set_gauge(f"{self.name}.queue_depth", self._waiting)
+
+        started_at = time.perf_counter()
+        metrics.observe(f"{self.name}.wait", started_at - queued_at)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the thread is done, not until the caller stops waiting:
+        # a cancelled request must not let more work into the pool than it has threads
+        def finished(_):
+            self._slots.release()
+            metrics.observe(f"{self.name}.latency", time.perf_counter() - started_at)
+            metrics.incr(f"{self.name}.completed")
+
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(finished, f))
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
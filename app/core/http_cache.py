@@ -0,0 +1,23 @@
+import hashlib
+from fastapi import Response, status
+
+# Authenticated resources: shared caches must not keep them, clients revalidate every time
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+# Method to build a strong ETag from the values that identify one version of a representation
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x00".join(str(part) for part in parts).encode()).hexdigest()
+    return '"' + digest[:32] + '"'
+
+
+# True when an If-None-Match header already names this ETag (weak comparison, as RFC 9110 asks for GET)
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
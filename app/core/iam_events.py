@@ -0,0 +1,112 @@
+import asyncio, json, os
+import asyncpg
+from sqlalchemy import text
+
+IAM_CHANNEL = "infintree_iam"
+IAM_LISTEN_RETRY_SECONDS = float(os.getenv("IAM_LISTEN_RETRY_SECONDS", 2))
+
+# Row-level changes carry the user id, statement-level changes flush everything
+IAM_TRIGGER_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION infintree_notify_iam() RETURNS trigger AS $$
+    DECLARE
+        uid text;
+    BEGIN
+        IF TG_LEVEL = 'ROW' THEN
+            IF TG_TABLE_NAME = 'users' THEN
+                uid := COALESCE(NEW.id, OLD.id)::text;
+            ELSE
+                uid := COALESCE(NEW.user_id, OLD.user_id)::text;
+            END IF;
+        END IF;
+        PERFORM pg_notify('{IAM_CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'user_id', uid)::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+_ROW_TABLES = ("users", "user_roles", "user_token_revocations")
+_STATEMENT_TABLES = ("roles", "permissions", "role_permissions", "group_department_associations")
+
+for _table in _ROW_TABLES:
+    IAM_TRIGGER_DDL += [
+        f"DROP TRIGGER IF EXISTS infintree_iam_notify ON {_table}",
+        f"CREATE TRIGGER infintree_iam_notify AFTER INSERT OR UPDATE OR DELETE ON {_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION infintree_notify_iam()",
+    ]
+
+for _table in _STATEMENT_TABLES:
+    IAM_TRIGGER_DDL += [
+        f"DROP TRIGGER IF EXISTS infintree_iam_notify ON {_table}",
+        f"CREATE TRIGGER infintree_iam_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {_table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION infintree_notify_iam()",
+    ]
+
+# Channel -> callbacks; other in-memory caches ride the same LISTEN connection on their own channel
+_handlers = {IAM_CHANNEL: []}
+
+# Event delivered when notifications may have been missed (listener (re)connected)
+_FLUSH_EVENT = {"table": None, "user_id": None}
+
+
+# Method to register a callback for IAM change events (or for another channel's events)
+def subscribe(handler, channel: str = IAM_CHANNEL):
+    _handlers.setdefault(channel, []).append(handler)
+
+
+# Method to broadcast an event to every worker listening on a channel; delivered on commit
+async def publish_event(db, channel: str, event: dict):
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": json.dumps(event)})
+
+
+# Method to broadcast a change that no table trigger sees (e.g. a policy reload)
+async def publish_iam_event(db, table: str, user_id: str | None = None):
+    await publish_event(db, IAM_CHANNEL, {"table": table, "user_id": user_id})
+
+
+def _dispatch(channel: str, event: dict):
+    for handler in _handlers.get(channel, []):
+        try:
+            handler(event)
+        except Exception as e:
+            print("IAM EVENT HANDLER ERROR:", e)
+
+
+def _dispatch_flush():
+    for channel in _handlers:
+        _dispatch(channel, dict(_FLUSH_EVENT))
+
+
+def _on_notify(connection, pid, channel, payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        event = dict(_FLUSH_EVENT)
+    _dispatch(channel, event)
+
+
+# Background loop holding a dedicated LISTEN connection
+async def run_iam_listener(dsn: str):
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            for channel in _handlers:
+                await conn.add_listener(channel, _on_notify)
+
+            # Anything could have changed while we were not listening
+            _dispatch_flush()
+
+            while not conn.is_closed():
+                await asyncio.sleep(IAM_LISTEN_RETRY_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("IAM LISTENER ERROR:", e)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+        _dispatch_flush()
+        await asyncio.sleep(IAM_LISTEN_RETRY_SECONDS)
@@ -1,69 +1,124 @@
+import asyncio, os
 import yaml
-from sqlalchemy import select
+from sqlalchemy import select, delete, tuple_, text
+from sqlalchemy.dialects.postgresql import insert
 from app.modules.permissions.model import Permission, Role, RolePermission
+from app.core.permission_matrix import IAM_POLICY_FILE, PermissionMatrix
+from app.core.iam_events import publish_iam_event
 
-async def load_iam_policies(db):
+# Serializes concurrent loads from several workers
+IAM_LOAD_LOCK_KEY = 0x1A3_0001
+IAM_POLICY_WATCH_SECONDS = float(os.getenv("IAM_POLICY_WATCH_SECONDS", 0))
 
-    with open("app/policies/iam_policies.yaml") as f:
-        policies = yaml.safe_load(f)
 
-    # 1 Load permissions
-    for p in policies["permissions"]:
-        exists = await db.scalar(select(Permission).where(Permission.code == p["code"]))
-        if not exists:
-            db.add(Permission(**p))
-    await db.commit()
+# Method to read the IAM policy file
+def read_iam_policies(path: str = IAM_POLICY_FILE) -> dict:
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+async def load_iam_policies(db, path: str = IAM_POLICY_FILE):
+    policies = read_iam_policies(path)
+    matrix = PermissionMatrix(policies)
+
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": IAM_LOAD_LOCK_KEY})
+
+    # 1 Current state in one pass
+    permissions = {p.code: p for p in (await db.scalars(select(Permission))).all()}
+    roles = {r.name: r for r in (await db.scalars(select(Role))).all()}
+    pairs = set((await db.execute(select(RolePermission.role_id, RolePermission.permission_id))).all())
+
+    diff = {"permissions_upserted": 0, "permissions_deleted": 0, "roles_upserted": 0, "role_permissions_added": 0, "role_permissions_removed": 0}
+
+    # 2 Permissions
+    wanted_permissions = {p["code"]: p for p in policies["permissions"]}
+    changed = [
+        p for code, p in wanted_permissions.items()
+        if code not in permissions
+        or (permissions[code].resource, permissions[code].action) != (p["resource"], p["action"])
+    ]
+    if changed:
+        stmt = insert(Permission).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Permission.code],
+            set_={"resource": stmt.excluded.resource, "action": stmt.excluded.action}
+        ).returning(Permission.id, Permission.code)
+        for perm_id, code in (await db.execute(stmt)).all():
+            permissions[code] = Permission(id=perm_id, code=code)
+        diff["permissions_upserted"] = len(changed)
+
+    # 3 Roles with scope
+    changed = [
+        {"name": name, "scope_type": data["scope"]}
+        for name, data in policies["roles"].items()
+        if name not in roles or roles[name].scope_type != data["scope"]
+    ]
+    if changed:
+        stmt = insert(Role).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Role.name],
+            set_={"scope_type": stmt.excluded.scope_type}
+        ).returning(Role.id, Role.name)
+        for role_id, name in (await db.execute(stmt)).all():
+            roles[name] = Role(id=role_id, name=name)
+        diff["roles_upserted"] = len(changed)
 
-    # 2 Load roles with scope
-    for role_name, role_data in policies["roles"].items():
+    # 4 Role -> permission mapping (wildcards expanded against the policy file)
+    wanted_pairs = {
+        (roles[name].id, permissions[code].id)
+        for name, data in policies["roles"].items()
+        for code in matrix.expand(data["permissions"])
+    }
 
-        scope_type = role_data["scope"]
-        perm_codes = role_data["permissions"]
+    missing = wanted_pairs - pairs
+    if missing:
+        await db.execute(
+            insert(RolePermission)
+            .values([{"role_id": r, "permission_id": p} for r, p in missing])
+            .on_conflict_do_nothing()
+        )
+        diff["role_permissions_added"] = len(missing)
 
-        role = await db.scalar(
-            select(Role).where(Role.name == role_name)
+    stale = pairs - wanted_pairs
+    if stale:
+        await db.execute(
+            delete(RolePermission)
+            .where(tuple_(RolePermission.role_id, RolePermission.permission_id).in_(list(stale)))
         )
+        diff["role_permissions_removed"] = len(stale)
+
+    # 5 Permissions dropped from the policy file (their mappings are gone above)
+    removed = [p.id for code, p in permissions.items() if code not in wanted_permissions]
+    if removed:
+        await db.execute(delete(Permission).where(Permission.id.in_(removed)))
+        diff["permissions_deleted"] = len(removed)
+
+    await db.commit()
+    return diff
+
+
+# Method to apply the policy file and tell every worker to recompile its matrix
+async def reload_iam_policies(db, path: str = IAM_POLICY_FILE):
+    diff = await load_iam_policies(db, path)
+    await publish_iam_event(db, "iam_policies")
+    await db.commit()
+    return diff
+
 
-        if not role:
-            role = Role(
-                name=role_name,
-                scope_type=scope_type
-            )
-            db.add(role)
-            await db.commit()
-        else:
-            # Optional: update scope if changed
-            role.scope_type = scope_type
-            await db.commit()
-
-        # 3 Map permissions
-        for code in perm_codes:
-
-            if code.endswith(".*"):
-                resource = code.split(".")[0]
-                perms = (
-                    await db.scalars(
-                        select(Permission).where(Permission.resource == resource)
-                    )
-                ).all()
-            else:
-                perm = await db.scalar(
-                    select(Permission).where(Permission.code == code)
-                )
-                perms = [perm] if perm else []
-
-            for p in perms:
-                exists = await db.scalar(
-                    select(RolePermission).where(
-                        RolePermission.role_id == role.id,
-                        RolePermission.permission_id == p.id
-                    )
-                )
-
-                if not exists:
-                    db.add(RolePermission(
-                        role_id=role.id,
-                        permission_id=p.id
-                    ))
-
-        await db.commit()
\ No newline at end of file
+# Background loop reloading the policies when the policy file changes on disk
+async def run_iam_policy_watch(session_factory, path: str = IAM_POLICY_FILE):
+    last_mtime = os.stat(path).st_mtime_ns
+    while True:
+        await asyncio.sleep(IAM_POLICY_WATCH_SECONDS)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            async with session_factory() as db:
+                diff = await reload_iam_policies(db, path)
+            print("IAM POLICIES RELOADED:", diff)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("IAM POLICY WATCH ERROR:", e)
@@ -0,0 +1,80 @@
+import hashlib, os, time, threading
+from collections import OrderedDict
+from app.core import metrics
+from app.core.iam_events import subscribe
+
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", 10000))
+
+
+# Bounded LRU of sha256(token) -> validated claims, each entry living until the token's exp
+class ClaimsCache:
+
+    def __init__(self, max_size: int = JWT_CLAIMS_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str, aud: str) -> bytes:
+        return hashlib.sha256(f"{aud}\x00{token}".encode()).digest()
+
+    def get(self, token: str, aud: str):
+        if self.max_size <= 0:
+            return None
+
+        digest = self._digest(token, aud)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                metrics.incr("claims_cache.misses")
+                return None
+
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                metrics.incr("claims_cache.misses")
+                metrics.incr("claims_cache.expired")
+                return None
+
+            self._entries.move_to_end(digest)
+            metrics.incr("claims_cache.hits")
+            return claims
+
+    def put(self, token: str, aud: str, claims: dict):
+        if self.max_size <= 0:
+            return
+
+        digest = self._digest(token, aud)
+        with self._lock:
+            self._entries[digest] = (claims, claims["exp"])
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.incr("claims_cache.evictions")
+            metrics.set_gauge("claims_cache.size", len(self._entries))
+
+    # Method to drop every cached token of one user (revocation)
+    def drop_user(self, user_id: str):
+        with self._lock:
+            stale = [d for d, (claims, _) in self._entries.items() if claims.get("sub") == user_id]
+            for digest in stale:
+                del self._entries[digest]
+            metrics.incr("claims_cache.invalidations", len(stale))
+            metrics.set_gauge("claims_cache.size", len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            metrics.incr("claims_cache.flushes")
+            metrics.set_gauge("claims_cache.size", 0)
+
+
+claims_cache = ClaimsCache()
+
+
+def _on_iam_event(event: dict):
+    if event.get("table") in ("users", "user_token_revocations") and event.get("user_id"):
+        claims_cache.drop_user(event["user_id"])
+
+
+subscribe(_on_iam_event)
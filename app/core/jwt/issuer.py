@@ -2,16 +2,20 @@ from datetime import datetime, timedelta, timezone
 from authlib.jose import jwt
 import os
 from app.core.jwt.key_store import get_active_key
+from app.core.permission_matrix import get_permission_matrix
 
 JWT_EXP_MIN = int(os.getenv("JWT_EXP_MIN", 60))
 
+# "bitset" writes compact pv/pbits claims, "list" the full permission code list
+JWT_PERMISSION_ENCODING = os.getenv("JWT_PERMISSION_ENCODING", "bitset").lower()
+
 
 def create_access_token(user, role_name, permissions, user_role, aud="infintree"):
     # Constants
     SCOPE_TYPE = None
     SCOPE_ID = None
 
-    kid, key = get_active_key()
+    kid, key, alg = get_active_key()
     now = datetime.now(timezone.utc)
 
     # Scope detection
@@ -30,15 +34,24 @@ def create_access_token(user, role_name, permissions, user_role, aud="infintree"
     payload = {
         "sub": str(user.id),
         "email": user.email,
+        "user_type": user.user_type,
         "roles": [role_name],
-        "permissions": permissions,
         "scope": {
             "type": SCOPE_TYPE,
             "id": SCOPE_ID
         },
         "aud": aud,
         "iat": int(now.timestamp()),
+        # Exact issue time, ordered against revocation markers (iat is whole seconds)
+        "iat_ms": int(now.timestamp() * 1000),
         "exp": int((now + timedelta(minutes=JWT_EXP_MIN)).timestamp()),
     }
 
-    return jwt.encode({"alg": "RS256", "kid": kid}, payload, key).decode()
+    if JWT_PERMISSION_ENCODING == "bitset":
+        matrix = get_permission_matrix()
+        payload["pv"] = matrix.version
+        payload["pbits"] = matrix.encode(permissions)
+    else:
+        payload["permissions"] = permissions
+
+    return jwt.encode({"alg": alg, "kid": kid}, payload, key).decode()
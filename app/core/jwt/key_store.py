@@ -1,10 +1,33 @@
-import json, os
+import json, os, time, fcntl, tempfile, threading, asyncio
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from authlib.jose import JsonWebKey
+from app.core.jwt.keyring import KeyRing, KEYRING_CHECK_INTERVAL
 
 KEYS_FILE = Path(os.getenv("KEYS_FILE", "keys.json"))
+KEYS_LOCK_FILE = KEYS_FILE.with_name(KEYS_FILE.name + ".lock")
 ROTATION_DAYS = int(os.getenv("JWT_ROTATION_DAYS", 30))
+ROTATION_CHECK_SECONDS = float(os.getenv("JWT_ROTATION_CHECK_SECONDS", 3600))
+RETIRED_KEEP_DAYS = int(os.getenv("JWT_RETIRED_KEEP_DAYS", 2))
+JWT_ALG = os.getenv("JWT_ALG", "RS256")
+
+# The next key is published a whole rotation period before it signs, so caching
+# the JWKS for up to one rotation check never hides a signing key from verifiers
+JWKS_MAX_AGE = int(os.getenv("JWT_JWKS_MAX_AGE", min(3600, ROTATION_CHECK_SECONDS)))
+
+# Signing algorithm -> (JWK key type, size or curve)
+KEY_TYPES = {
+    "RS256": ("RSA", 2048),
+    "ES256": ("EC", "P-256"),
+    "EdDSA": ("OKP", "Ed25519"),
+}
+
+# keys.json layout:
+#   {"current": entry, "next": entry, "retired": [entry without "private"]}
+# "next" is published in the JWKS before it signs anything, so every verifier
+# already knows it by the time it gets promoted. Each entry records its "alg",
+# so keys of different algorithms can coexist while JWT_ALG is being changed.
 
 
 def utcnow():
@@ -14,47 +37,170 @@ def utcnow():
 def _load():
     if not KEYS_FILE.exists():
         return None
-    return json.loads(KEYS_FILE.read_text())
-
+    data = json.loads(KEYS_FILE.read_text())
 
-def _save(data):
-    KEYS_FILE.write_text(json.dumps(data, indent=2))
+    # Single-key layout written by older versions
+    if "current" not in data:
+        data = {"current": data, "next": None, "retired": []}
+    return data
 
 
-def _generate():
-    key = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+# Write to a temp file in the same directory and rename over the old file
+def _save(data):
+    KEYS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=KEYS_FILE.parent, prefix=KEYS_FILE.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(data, indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, KEYS_FILE)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+# Cross-process lock so only one worker rotates at a time
+@contextmanager
+def _file_lock():
+    KEYS_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(KEYS_LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _generate(alg):
+    kty, crv_or_size = KEY_TYPES[alg]
+    key = JsonWebKey.generate_key(kty, crv_or_size, is_private=True)
     kid = key.thumbprint()
     return kid, key
 
 
+def _alg(entry):
+    return entry.get("alg", "RS256")
+
+
+def _new_entry(now, alg=None):
+    alg = alg or JWT_ALG
+    kid, key = _generate(alg)
+    return {
+        "kid": kid,
+        "alg": alg,
+        "created": now.isoformat(),
+        "private": key.as_dict(True),
+        "public": key.as_dict(False),
+    }
+
+
+# Method to rotate the keyring on disk; returns True when the file changed
+def rotate_keys(now=None) -> bool:
+    now = now or utcnow()
+
+    with _file_lock():
+        # Re-read under the lock: another worker may have rotated already
+        data = _load()
+        changed = False
+
+        if not data:
+            data = {"current": _new_entry(now), "next": None, "retired": []}
+            changed = True
+
+        current_created = datetime.fromisoformat(data["current"]["created"])
+        if now - current_created > timedelta(days=ROTATION_DAYS):
+            retired = data["current"]
+            data["retired"].insert(0, {"kid": retired["kid"], "alg": _alg(retired), "retired_at": now.isoformat(), "public": retired["public"]})
+            data["current"] = data["next"] or _new_entry(now)
+            data["current"]["created"] = now.isoformat()
+            data["next"] = None
+            changed = True
+
+        # A pre-generated next key of the old algorithm has never signed; replace it
+        if not data["next"] or _alg(data["next"]) != JWT_ALG:
+            data["next"] = _new_entry(now)
+            changed = True
+
+        keep = [r for r in data["retired"] if now - datetime.fromisoformat(r["retired_at"]) <= timedelta(days=RETIRED_KEEP_DAYS)]
+        if len(keep) != len(data["retired"]):
+            data["retired"] = keep
+            changed = True
+
+        if changed:
+            _save(data)
+            for entry in (data["current"], data["next"]):
+                verification_keyring.add(_public_jwk(entry))
+        return changed
+
+
+# In-memory signer, reloaded only when keys.json is replaced
+class _SignerCache:
+
+    def __init__(self):
+        self._stamp = None
+        self._signer = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._signer is not None and now - self._checked_at < KEYRING_CHECK_INTERVAL:
+            return self._signer
+
+        with self._lock:
+            self._checked_at = now
+            stamp = self._file_stamp()
+            if stamp is None:
+                # Keys are created by ensure_keys() at startup; never generate them on a request
+                raise RuntimeError(f"Signing keys not found at {KEYS_FILE}; ensure_keys() must run at startup")
+
+            if stamp != self._stamp:
+                current = _load()["current"]
+                self._signer = (current["kid"], JsonWebKey.import_key(current["private"]), _alg(current))
+                self._stamp = stamp
+            return self._signer
+
+    def _file_stamp(self):
+        try:
+            st = KEYS_FILE.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get_uncached(self):
+        self._checked_at = 0.0
+        self._stamp = None
+        return self.get()
+
+
+_signer_cache = _SignerCache()
+
+
+# Method to get the (kid, private key, alg) used to sign new tokens
 def get_active_key():
-    now = utcnow()
-    data = _load()
+    return _signer_cache.get()
 
-    if not data:
-        kid, key = _generate()
-        data = {
-            "kid": kid,
-            "created": now.isoformat(),
-            "private": key.as_dict(True),
-            "public": key.as_dict(False),
-        }
-        _save(data)
-        return kid, key
-
-    created = datetime.fromisoformat(data["created"])
-    if now - created > timedelta(days=ROTATION_DAYS):
-        kid, key = _generate()
-        data = {
-            "kid": kid,
-            "created": now.isoformat(),
-            "private": key.as_dict(True),
-            "public": key.as_dict(False),
-        }
-        _save(data)
-        return kid, key
-
-    return data["kid"], JsonWebKey.import_key(data["private"])
+
+# Method to make sure a current and a next key exist before serving logins
+def ensure_keys():
+    rotate_keys()
+    return _signer_cache.get_uncached()
+
+
+# Background loop pre-generating the next key and promoting it on schedule
+async def run_key_rotation():
+    while True:
+        await asyncio.sleep(ROTATION_CHECK_SECONDS)
+        try:
+            await asyncio.to_thread(rotate_keys)
+        except Exception as e:
+            print("KEY ROTATION ERROR:", e)
+
+
+def _public_jwk(entry):
+    return {**entry["public"], "kid": entry["kid"], "use": "sig", "alg": _alg(entry)}
 
 
 def get_jwks():
@@ -62,6 +208,9 @@ def get_jwks():
     if not data:
         return {"keys": []}
 
-    pub = data["public"]
-    pub.update({"kid": data["kid"], "use": "sig", "alg": "RS256"})
-    return {"keys": [pub]}
+    entries = [data["current"], data["next"], *data["retired"]]
+    return {"keys": [_public_jwk(e) for e in entries if e]}
+
+
+# Parsed verification keys shared by every request in this process
+verification_keyring = KeyRing(KEYS_FILE, get_jwks)
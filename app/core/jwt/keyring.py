@@ -0,0 +1,105 @@
+import os, time, threading, json, hashlib
+from collections import OrderedDict
+from authlib.jose import JsonWebKey
+
+KEYRING_CHECK_INTERVAL = float(os.getenv("JWT_KEYRING_CHECK_INTERVAL", 1))
+KEYRING_RETAIN = int(os.getenv("JWT_KEYRING_RETAIN", 4))
+
+
+# Process-wide ring of parsed public keys (with their algorithm) indexed by kid
+class KeyRing:
+
+    def __init__(self, path, loader, check_interval=KEYRING_CHECK_INTERVAL, retain=KEYRING_RETAIN):
+        self._path = path
+        self._loader = loader
+        self._check_interval = check_interval
+        self._retain = retain
+        self._keys = OrderedDict()
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._file_kids = None
+        self._listeners = []
+        self._jwks = ({"keys": []}, None)
+
+    # Identity of the key file on disk (inode + mtime + size)
+    def _file_stamp(self):
+        try:
+            st = self._path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    # Method to import a public JWK dict and keep it in the ring
+    def _put(self, jwk_dict):
+        kid = jwk_dict["kid"]
+        if kid not in self._keys:
+            self._keys[kid] = (JsonWebKey.import_key(jwk_dict), jwk_dict.get("alg", "RS256"))
+        self._keys.move_to_end(kid)
+
+        # Previous keys stay available so older tokens still verify
+        while len(self._keys) > self._retain:
+            self._keys.popitem(last=False)
+
+    # Method to reload the ring when the key file changed on disk
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self._check_interval:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return
+
+            jwks = self._loader()["keys"]
+            for jwk_dict in jwks:
+                self._put(jwk_dict)
+            self._stamp = stamp
+            self._set_jwks(jwks)
+
+            # Key set changed on disk: a rotation or a retirement happened
+            kids = {jwk_dict["kid"] for jwk_dict in jwks}
+            rotated = self._file_kids is not None and kids != self._file_kids
+            self._file_kids = kids
+
+        if rotated:
+            for listener in self._listeners:
+                listener()
+
+    # Method to register a callback fired when the key set on disk changes
+    def on_rotate(self, listener):
+        self._listeners.append(listener)
+
+    # Method to register a freshly rotated key without waiting for the file check
+    def add(self, jwk_dict: dict):
+        with self._lock:
+            self._put(jwk_dict)
+            current = self._jwks[0]["keys"]
+            if all(k["kid"] != jwk_dict["kid"] for k in current):
+                self._set_jwks([*current, jwk_dict])
+
+    # Published key set (as on disk) with a strong ETag over its canonical JSON
+    def _set_jwks(self, keys):
+        jwks = {"keys": list(keys)}
+        body = json.dumps(jwks, sort_keys=True, separators=(",", ":"))
+        self._jwks = (jwks, '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"')
+
+    # Method to get the public JWKS and its ETag without touching the file
+    def jwks(self):
+        self.refresh()
+        return self._jwks
+
+    # Method to get the (parsed public key, alg) pair for a kid
+    def get(self, kid: str):
+        self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            # Another worker may have rotated; only re-stat, reload happens on change
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+    def kids(self):
+        return list(self._keys)
@@ -0,0 +1,99 @@
+# Offline verification of infintree access tokens for other Python services.
+#
+#   verifier = RemoteTokenVerifier("https://infintree.internal/.well-known/jwks.json")
+#   claims = verifier.verify(token)
+#
+# Only depends on authlib and the standard library, so it can be copied or
+# imported without pulling in the rest of the application.
+import base64, json, re, threading, time
+import urllib.request
+from urllib.error import HTTPError
+from authlib.jose import jwt, JsonWebKey
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+# JWKS-backed verifier honouring ETag / Cache-Control of the JWKS endpoint
+class RemoteTokenVerifier:
+
+    def __init__(self, jwks_url: str, audience: str = "infintree", leeway: int = 60, min_refresh_interval: float = 30, timeout: float = 5):
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.leeway = leeway
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._etag = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        request = urllib.request.Request(self.jwks_url, headers={"Accept": "application/json"})
+        if self._etag:
+            request.add_header("If-None-Match", self._etag)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                body = json.loads(resp.read())
+                headers = resp.headers
+            self._keys = {
+                k["kid"]: (JsonWebKey.import_key(k), k.get("alg", "RS256"))
+                for k in body.get("keys", [])
+            }
+            self._etag = headers.get("ETag")
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            headers = e.headers
+
+        now = time.monotonic()
+        match = re.search(r"max-age=(\d+)", headers.get("Cache-Control") or "")
+        self._fetched_at = now
+        self._expires_at = now + (int(match.group(1)) if match else 0)
+
+    def _key_for(self, kid: str):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires_at:
+                self._fetch()
+            elif kid not in self._keys and now - self._fetched_at >= self.min_refresh_interval:
+                # Unknown kid: the issuer may have rotated; refetch at most every min_refresh_interval
+                self._fetch()
+            return self._keys.get(kid)
+
+    @staticmethod
+    def _header(token: str) -> dict:
+        try:
+            segment = token.split(".")[0]
+            return json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        except (ValueError, IndexError) as e:
+            raise TokenVerificationError("Malformed token") from e
+
+    # Method to verify a token's signature, expiry and audience; returns its claims
+    def verify(self, token: str) -> dict:
+        header = self._header(token)
+        entry = self._key_for(header.get("kid") or "")
+        if entry is None:
+            raise TokenVerificationError("Unknown signing key")
+
+        key, alg = entry
+        if header.get("alg") != alg:
+            raise TokenVerificationError("Unexpected signing algorithm")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                claims_options={
+                    "exp": {"essential": True},
+                    "aud": {"essential": True, "value": self.audience},
+                },
+                claims_params={"leeway": self.leeway}
+            )
+            claims.validate()
+        except Exception as e:
+            raise TokenVerificationError(str(e)) from e
+        return dict(claims)
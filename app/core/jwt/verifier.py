@@ -1,25 +1,37 @@
 import json, os, base64
 from fastapi import HTTPException, status
-from authlib.jose import jwt, JsonWebKey
-from app.core.jwt.key_store import get_jwks
+from authlib.jose import jwt
+from app.core.jwt.key_store import verification_keyring
+from app.core.jwt.claims_cache import claims_cache
 from app.core.security import decode_jwt_header
 
 LEEWAY = int(os.getenv("JWT_LEEWAY", 60))
 
+# After a rotation or retirement every token goes through full verification again
+verification_keyring.on_rotate(claims_cache.clear)
+
 
 def verify_token(token: str, aud: str):
+    # Hot tokens skip header parsing, key lookup and signature checks
+    verification_keyring.refresh()
+    cached = claims_cache.get(token, aud)
+    if cached is not None:
+        return dict(cached)
+
     try:
         header = decode_jwt_header(token)
         kid = header.get("kid")
         if not kid:
             raise HTTPException(401, "Missing kid")
 
-        jwks = get_jwks()
-        jwk_dict = next((k for k in jwks["keys"] if k["kid"] == kid), None)
-        if not jwk_dict:
+        entry = verification_keyring.get(kid)
+        if entry is None:
             raise HTTPException(401, "Unknown signing key")
 
-        key = JsonWebKey.import_key(jwk_dict)
+        # The key decides the algorithm, never the token header
+        key, alg = entry
+        if header.get("alg") != alg:
+            raise HTTPException(401, "Unexpected signing algorithm")
 
         claims = jwt.decode(
             token,
@@ -32,7 +44,9 @@ def verify_token(token: str, aud: str):
         )
 
         claims.validate()
-        return dict(claims)
+        result = dict(claims)
+        claims_cache.put(token, aud, result)
+        return dict(result)
 
     except HTTPException:
         raise
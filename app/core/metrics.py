@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_timings = {}
+
+
+# Method to increment a counter
+def incr(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+# Method to set a gauge to its current value
+def set_gauge(name: str, value):
+    with _lock:
+        _gauges[name] = value
+
+
+# Method to record a duration in seconds
+def observe(name: str, seconds: float):
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+
+# Method to get a point-in-time copy of every metric
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": {
+                name: {
+                    "count": t["count"],
+                    "avg_ms": round(t["total"] / t["count"] * 1000, 3) if t["count"] else 0.0,
+                    "max_ms": round(t["max"] * 1000, 3),
+                }
+                for name, t in _timings.items()
+            },
+        }
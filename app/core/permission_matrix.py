@@ -0,0 +1,170 @@
+import base64, hashlib
+from functools import lru_cache
+import yaml
+from sqlalchemy import select
+from app.modules.groups.model import GroupDepartmentAssociation
+from app.core.iam_events import subscribe
+
+IAM_POLICY_FILE = "app/policies/iam_policies.yaml"
+FULL_ACCESS = "system.full_access"
+
+
+# Roles and permissions from the IAM policy file compiled into one bitmask per role
+class PermissionMatrix:
+
+    def __init__(self, policies: dict):
+        self.codes = [p["code"] for p in policies["permissions"]]
+        self.bits = {code: 1 << i for i, code in enumerate(self.codes)}
+        self.all_bits = (1 << len(self.codes)) - 1
+
+        # Identifies the bit layout; tokens carry it next to their encoded permissions
+        self.version = hashlib.sha256("\n".join(self.codes).encode()).hexdigest()[:8]
+
+        self.role_scopes = {}
+        self.role_masks = {}
+        for role_name, role_data in policies["roles"].items():
+            self.role_scopes[role_name] = role_data["scope"]
+            self.role_masks[role_name] = self.mask_of(self.expand(role_data["permissions"]))
+
+    # Method to expand "resource.*" wildcards into concrete permission codes
+    def expand(self, codes):
+        expanded = []
+        for code in codes:
+            if code.endswith(".*"):
+                resource = code.split(".")[0] + "."
+                expanded.extend(c for c in self.codes if c.startswith(resource))
+            elif code in self.bits:
+                expanded.append(code)
+        return expanded
+
+    def mask_of(self, codes) -> int:
+        mask = 0
+        for code in codes:
+            mask |= self.bits.get(code, 0)
+        if mask & self.bits.get(FULL_ACCESS, 0):
+            return self.all_bits
+        return mask
+
+    def bit(self, code: str) -> int:
+        return self.bits.get(code, 0)
+
+    def codes_of(self, mask: int) -> frozenset:
+        return frozenset(code for code, bit in self.bits.items() if mask & bit)
+
+    # Method to encode permission codes as a base64url bitset (little-endian)
+    def encode(self, codes) -> str:
+        mask = 0
+        for code in codes:
+            mask |= self.bits.get(code, 0)
+        raw = mask.to_bytes(max(1, (mask.bit_length() + 7) // 8), "little")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    def compile_access(self, bindings, group_departments) -> "AccessMask":
+        global_mask, department_masks = 0, {}
+        for role_name, department_id, group_id, mask in bindings:
+            if department_id:
+                department_masks[department_id] = department_masks.get(department_id, 0) | mask
+            elif group_id:
+                for member_department_id in group_departments.get(group_id, ()):
+                    department_masks[member_department_id] = department_masks.get(member_department_id, 0) | mask
+            else:
+                global_mask |= mask
+        return AccessMask(self, global_mask, department_masks)
+
+
+# Per-principal answer to "may this user do P (in department D)"
+class AccessMask:
+    __slots__ = ("_matrix", "global_mask", "department_masks", "any_mask")
+
+    def __init__(self, matrix: PermissionMatrix, global_mask: int, department_masks: dict):
+        self._matrix = matrix
+        self.global_mask = global_mask
+        self.department_masks = department_masks
+        self.any_mask = global_mask
+        for mask in department_masks.values():
+            self.any_mask |= mask
+
+    def allows(self, permission_code: str, department_id: str | None = None) -> bool:
+        bit = self._matrix.bit(permission_code)
+        if not bit:
+            return False
+        if department_id is None:
+            return bool(self.any_mask & bit)
+        return bool((self.global_mask | self.department_masks.get(department_id, 0)) & bit)
+
+
+_matrix = None
+
+# Every layout compiled in this process, so tokens minted before a reload still decode
+_matrices_by_version = {}
+
+# group_id -> department ids, expanded from GroupDepartmentAssociation
+_group_departments = {}
+_groups_stale = True
+
+
+# Method to compile the IAM policy file into the process-wide matrix
+def compile_permission_matrix(path: str = IAM_POLICY_FILE) -> PermissionMatrix:
+    global _matrix
+    with open(path) as f:
+        _matrix = PermissionMatrix(yaml.safe_load(f))
+    _matrices_by_version[_matrix.version] = _matrix
+    return _matrix
+
+
+def get_permission_matrix() -> PermissionMatrix:
+    if _matrix is None:
+        return compile_permission_matrix()
+    return _matrix
+
+
+def _decode_bits(bits: str) -> int:
+    return int.from_bytes(base64.urlsafe_b64decode(bits + "=" * (-len(bits) % 4)), "little")
+
+
+# Method to turn compact "pv"/"pbits" claims into (mask in the current layout, permission codes)
+@lru_cache(maxsize=4096)
+def decode_permission_bits(version: str, bits: str, roles: tuple, current: PermissionMatrix):
+    source = _matrices_by_version.get(version)
+    if source is None:
+        # Unknown layout (e.g. minted before this worker started): fall back to the roles
+        mask = 0
+        for role_name in roles:
+            mask |= current.role_masks.get(role_name, 0)
+        return mask, current.codes_of(mask)
+
+    codes = source.codes_of(_decode_bits(bits))
+    return current.mask_of(codes), codes
+
+
+# Method to get the group membership map, reloading it after a change
+async def get_group_departments(db) -> dict:
+    global _groups_stale, _group_departments
+    if _groups_stale:
+        rows = (await db.execute(
+            select(GroupDepartmentAssociation.group_id, GroupDepartmentAssociation.department_id)
+        )).all()
+
+        group_departments = {}
+        for group_id, department_id in rows:
+            group_departments.setdefault(str(group_id), set()).add(str(department_id))
+        _group_departments = {k: frozenset(v) for k, v in group_departments.items()}
+        _groups_stale = False
+    return _group_departments
+
+
+def _on_iam_event(event: dict):
+    global _groups_stale
+    table = event.get("table")
+    if table in (None, "group_department_associations"):
+        _groups_stale = True
+
+    # Policy hot reload: every worker recompiles from the policy file
+    if table in (None, "iam_policies", "roles", "permissions", "role_permissions"):
+        try:
+            compile_permission_matrix()
+        except Exception as e:
+            print("PERMISSION MATRIX COMPILE ERROR:", e)
+
+
+subscribe(_on_iam_event)
@@ -0,0 +1,77 @@
+from dataclasses import dataclass, field
+from app.core.permission_matrix import PermissionMatrix, AccessMask, decode_permission_bits
+
+
+# Lightweight authenticated caller built without touching the database
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: str
+    email: str | None
+    user_type: str | None
+    roles: tuple = ()
+    permissions: frozenset = field(default_factory=frozenset)
+    scope: dict | None = None
+    bindings: tuple = ()
+    access: AccessMask | None = None
+
+    @classmethod
+    def from_claims(cls, claims: dict, matrix: PermissionMatrix, group_departments: dict) -> "Principal":
+        roles = tuple(claims.get("roles") or ())
+        user_type = claims.get("user_type") or ("ROOT_ADMIN" if "ROOT_ADMIN" in roles else None)
+        if "pbits" in claims:
+            mask, permissions = decode_permission_bits(claims.get("pv"), claims["pbits"], roles, matrix)
+        else:
+            permissions = frozenset(claims.get("permissions") or ())
+            mask = matrix.mask_of(permissions)
+
+        scope = claims.get("scope") or {}
+        scope_id = scope.get("id")
+        department_id = scope_id if scope.get("type") == "department" else None
+        group_id = scope_id if scope.get("type") == "group" else None
+
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            user_type=user_type,
+            roles=roles,
+            permissions=permissions,
+            scope=scope,
+            bindings=tuple((role, department_id, group_id) for role in roles),
+            access=matrix.compile_access([(None, department_id, group_id, mask)], group_departments),
+        )
+
+    @classmethod
+    def from_user(cls, user, grants, matrix: PermissionMatrix, group_departments: dict) -> "Principal":
+        roles, permissions, bindings, role_codes = [], set(), set(), {}
+        for role_name, department_id, group_id, code in grants:
+            if role_name not in roles:
+                roles.append(role_name)
+            if code:
+                permissions.add(code)
+                role_codes.setdefault(role_name, set()).add(code)
+            bindings.add((
+                role_name,
+                str(department_id) if department_id else None,
+                str(group_id) if group_id else None,
+            ))
+
+        scoped = [
+            (role_name, department_id, group_id, matrix.role_masks.get(role_name) or matrix.mask_of(role_codes.get(role_name, ())))
+            for role_name, department_id, group_id in bindings
+        ]
+
+        return cls(
+            id=str(user.id),
+            email=user.email,
+            user_type=user.user_type,
+            roles=tuple(roles),
+            permissions=frozenset(permissions),
+            bindings=tuple(sorted(bindings, key=lambda b: tuple(x or "" for x in b))),
+            access=matrix.compile_access(scoped, group_departments),
+        )
+
+    # Method to check a permission, optionally inside one department
+    def can(self, permission_code: str, department_id: str | None = None) -> bool:
+        if self.user_type == "ROOT_ADMIN":
+            return True
+        return self.access is not None and self.access.allows(permission_code, department_id)
@@ -0,0 +1,91 @@
+import os, time, threading
+from collections import OrderedDict
+from app.core import metrics
+from app.core.iam_events import subscribe
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+
+
+# In-process user_id -> Principal cache with TTL and LRU eviction
+class PrincipalCache:
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load racing an invalidation is not cached
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: str):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                metrics.incr("principal_cache.misses")
+                return None
+
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                metrics.incr("principal_cache.misses")
+                metrics.incr("principal_cache.expired")
+                return None
+
+            self._entries.move_to_end(user_id)
+            metrics.incr("principal_cache.hits")
+            return principal
+
+    def put(self, user_id: str, principal, generation: int | None = None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.incr("principal_cache.evictions")
+            metrics.set_gauge("principal_cache.size", len(self._entries))
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+            metrics.incr("principal_cache.invalidations")
+            metrics.set_gauge("principal_cache.size", len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            metrics.incr("principal_cache.flushes")
+            metrics.set_gauge("principal_cache.size", 0)
+
+
+principal_cache = PrincipalCache()
+
+
+# Drop cached principals when users, grants or policies change in any worker
+def _on_iam_event(event: dict):
+    if event.get("user_id"):
+        principal_cache.invalidate(event["user_id"])
+    else:
+        principal_cache.clear()
+
+
+subscribe(_on_iam_event)
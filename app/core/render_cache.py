@@ -0,0 +1,148 @@
+import importlib, os, time, threading
+from collections import OrderedDict
+from app.core import metrics
+from app.core.iam_events import subscribe, publish_event
+
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", 64 * 1024 * 1024))
+RENDER_CACHE_TTL = float(os.getenv("RENDER_CACHE_TTL", 300))
+# Largest single response worth keeping, as a fraction of the whole budget
+RENDER_CACHE_MAX_ENTRY_FRACTION = float(os.getenv("RENDER_CACHE_MAX_ENTRY_FRACTION", 0.1))
+# "local" or "package.module:factory" returning a shared backend
+RENDER_CACHE_BACKEND = os.getenv("RENDER_CACHE_BACKEND", "local")
+RENDER_CHANNEL = "infintree_render"
+
+
+# In-process backend: byte-bounded LRU of rendered bodies plus version counters.
+# A shared backend (e.g. Redis) exposes the same get/set/incr/counter methods and
+# sets shared = True; its counters are then seen by every worker directly.
+class LocalRenderBackend:
+    shared = False
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            body, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes, ttl: float):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (body, time.monotonic() + ttl)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                metrics.incr("render_cache.evictions")
+            metrics.set_gauge("render_cache.bytes", self._bytes)
+
+    def _drop(self, key: str):
+        body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            metrics.set_gauge("render_cache.bytes", 0)
+
+
+# Stand-in for a shared backend inside one process (tests, single worker dev):
+# RENDER_CACHE_BACKEND=app.core.render_cache:SharedStandInBackend
+class SharedStandInBackend(LocalRenderBackend):
+    shared = True
+
+
+# Method to build the configured backend
+def load_render_backend(spec: str = RENDER_CACHE_BACKEND):
+    if spec == "local":
+        return LocalRenderBackend()
+    module_name, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module_name), factory)()
+
+
+# Pre-serialized response bodies keyed by a per-department version; writers bump
+# the version, which makes every older entry of the department unreachable
+class RenderCache:
+
+    def __init__(self, backend, ttl: float = RENDER_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entry_bytes = int(getattr(backend, "max_bytes", RENDER_CACHE_BYTES) * RENDER_CACHE_MAX_ENTRY_FRACTION)
+        # Bumped locally when invalidations may have been missed
+        self._epoch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entry_bytes > 0
+
+    # Current version of a department; read it before querying so a racing write is never cached as current
+    def version(self, department_id) -> str:
+        return f"{self._epoch}.{self.backend.counter(f'render:v:{department_id}')}"
+
+    def get(self, department_id, version: str, key: str):
+        if not self.enabled:
+            return None
+        body = self.backend.get(f"render:{department_id}:{version}:{key}")
+        metrics.incr("render_cache.hits" if body is not None else "render_cache.misses")
+        return body
+
+    def put(self, department_id, version: str, key: str, body: bytes):
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return
+        self.backend.set(f"render:{department_id}:{version}:{key}", body, self.ttl)
+
+    def bump(self, department_id):
+        self.backend.incr(f"render:v:{department_id}")
+        metrics.incr("render_cache.invalidations")
+
+    def flush(self):
+        self._epoch += 1
+        if not self.backend.shared:
+            self.backend.clear()
+        metrics.incr("render_cache.flushes")
+
+    # Method to invalidate a department after its documents changed (call after the write committed)
+    async def invalidate(self, db, department_id):
+        self.bump(department_id)
+        if not self.backend.shared:
+            await publish_event(db, RENDER_CHANNEL, {"department_id": str(department_id)})
+            await db.commit()
+
+
+render_cache = RenderCache(load_render_backend())
+
+
+# Bump departments changed in any worker (our own echo costs one extra bump); a listener reconnect flushes everything
+def _on_render_event(event: dict):
+    department_id = event.get("department_id")
+    if department_id is None:
+        render_cache.flush()
+    else:
+        render_cache.bump(department_id)
+
+
+subscribe(_on_render_event, RENDER_CHANNEL)
@@ -0,0 +1,85 @@
+import asyncio, os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from app.modules.users.model import UserTokenRevocation
+from app.core.jwt.issuer import JWT_EXP_MIN
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+
+# user_id -> epoch milliseconds; tokens issued before it are no longer accepted
+_not_before = {}
+_watermark = None
+
+
+def _remember(user_id, not_before: datetime):
+    ts = int(not_before.timestamp() * 1000)
+    key = str(user_id)
+    if ts > _not_before.get(key, 0):
+        _not_before[key] = ts
+
+
+# Method to read a token's issue time in milliseconds: iat_ms when present, else the whole-second iat
+# (older tokens; one minted in the revocation's second counts as issued before it)
+def token_issued_at_ms(claims: dict) -> int:
+    if isinstance(claims.get("iat_ms"), int):
+        return claims["iat_ms"]
+    return int(claims.get("iat") or 0) * 1000
+
+
+# Method to check a token's issue time (epoch ms) against the user's revocation marker
+def is_token_revoked(user_id: str, issued_at_ms: int) -> bool:
+    not_before = _not_before.get(str(user_id))
+    if not_before is None:
+        return False
+    return issued_at_ms < not_before
+
+
+# Method to invalidate every token issued to a user so far
+async def revoke_user_tokens(db, user_id):
+    now = datetime.now(timezone.utc)
+    stmt = (
+        insert(UserTokenRevocation)
+        .values(user_id=user_id, not_before=now)
+        .on_conflict_do_update(
+            index_elements=[UserTokenRevocation.user_id],
+            set_={"not_before": now, "updated_at": func.now()}
+        )
+    )
+    await db.execute(stmt)
+    await db.commit()
+    _remember(user_id, now)
+
+
+# Method to pull revocations written by other workers since the last sync
+async def sync_revocations(db):
+    global _watermark
+
+    # Markers older than a token lifetime cannot reject anything any more
+    horizon = datetime.now(timezone.utc) - timedelta(minutes=JWT_EXP_MIN + 5)
+    stmt = select(UserTokenRevocation).where(UserTokenRevocation.not_before > horizon)
+    if _watermark is not None:
+        stmt = stmt.where(UserTokenRevocation.updated_at >= _watermark)
+
+    rows = (await db.scalars(stmt)).all()
+    for row in rows:
+        _remember(row.user_id, row.not_before)
+        if _watermark is None or row.updated_at > _watermark:
+            _watermark = row.updated_at
+
+    cutoff = int(horizon.timestamp() * 1000)
+    for user_id in [k for k, v in _not_before.items() if v < cutoff]:
+        _not_before.pop(user_id, None)
+
+
+# Background loop keeping the in-memory revocation list current
+async def run_revocation_sync(session_factory):
+    while True:
+        try:
+            async with session_factory() as db:
+                await sync_revocations(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("REVOCATION SYNC ERROR:", e)
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
@@ -1,12 +1,26 @@
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
+from fastapi import HTTPException, status
+from app.core.executor import BoundedExecutor, ExecutorSaturated
 import jwt
+import os
 import re
+import hashlib
+import secrets
+
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 32))
+PASSWORD_HASH_RETRY_AFTER = os.getenv("PASSWORD_HASH_RETRY_AFTER", "1")
+
+# Argon2 cost per deployment tier; pick values with `python -m app.core.calibrate_password_hash`
+PASSWORD_TIME_COST = int(os.getenv("PASSWORD_TIME_COST", 3))
+PASSWORD_MEMORY_COST = int(os.getenv("PASSWORD_MEMORY_COST", 65536))
+PASSWORD_PARALLELISM = int(os.getenv("PASSWORD_PARALLELISM", 4))
 
 pwd_hasher = PasswordHasher(
-    time_cost=3,
-    memory_cost=65536,
-    parallelism=4,
+    time_cost=PASSWORD_TIME_COST,
+    memory_cost=PASSWORD_MEMORY_COST,
+    parallelism=PASSWORD_PARALLELISM,
     hash_len=32,
     salt_len=16
 )
@@ -20,6 +34,39 @@ def verify_password(password: str, stored: str) -> bool:
     except VerifyMismatchError:
         return False
 
+# True when a stored hash was made with parameters other than the current ones
+def password_needs_rehash(stored: str) -> bool:
+    try:
+        return pwd_hasher.check_needs_rehash(stored)
+    except Exception:
+        return False
+
+# Argon2 runs here so it never blocks the event loop; the cap also bounds memory (workers x memory_cost)
+password_hash_pool = BoundedExecutor("password_hash", PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_QUEUE)
+
+async def _run_hash_job(fn, *args):
+    try:
+        return await password_hash_pool.run(fn, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Authentication service busy, retry shortly",
+            headers={"Retry-After": PASSWORD_HASH_RETRY_AFTER}
+        )
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hash_job(hash_password, password)
+
+async def verify_password_async(password: str, stored: str) -> bool:
+    return await _run_hash_job(verify_password, password, stored)
+
+# Opaque refresh token; only its sha256 digest is stored (high entropy, so no slow hash needed)
+def generate_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def digest_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 # Decode jwt header without verification
 def decode_jwt_header(token: str) -> dict:
     try:
@@ -2,7 +2,7 @@ from sqlalchemy import select
 from app.modules.users.model import User, UserRole
 from app.modules.permissions.model import Role
 from app.core.iam_loader import load_iam_policies
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 import os
 
 ROOT_EMAIL = os.getenv("ROOT_ADMIN_EMAIL", "root@infintree.io")
@@ -21,7 +21,7 @@ async def seed_system(db):
             email=ROOT_EMAIL,
             first_name="Root",
             last_name="Admin",
-            password_hash=hash_password(ROOT_PASSWORD),
+            password_hash=await hash_password_async(ROOT_PASSWORD),
             default_password=True,
             user_type="ROOT_ADMIN"
         )
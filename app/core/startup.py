@@ -0,0 +1,105 @@
+import hashlib, os, time
+from contextlib import contextmanager
+from sqlalchemy import select, text, func
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.schema import CreateTable, CreateIndex
+from app.core import metrics
+from app.core.seed import seed_system, ROOT_EMAIL
+from app.core.permission_matrix import IAM_POLICY_FILE
+from app.db.base import Base
+from app.db.session import engine, init_db, AsyncSessionLocal, EXTRA_DDL
+from app.modules.system.model import SystemState
+
+STARTUP_LOCK_KEY = 0x1A3_0002
+BOOTSTRAP_STATE_KEY = "bootstrap_fingerprint"
+STARTUP_FORCE_BOOTSTRAP = os.getenv("STARTUP_FORCE_BOOTSTRAP", "false").lower() == "true"
+
+
+# Per-worker cold start timings
+class BootTimer:
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = round(elapsed * 1000, 1)
+            metrics.observe(f"startup.{name}", elapsed)
+
+    def report(self):
+        total = time.perf_counter() - self.started_at
+        metrics.observe("startup.total", total)
+        phases = " ".join(f"{name}={ms}ms" for name, ms in self.phases.items())
+        print(f"INFINTREE boot pid={os.getpid()} total={round(total * 1000, 1)}ms {phases}")
+
+
+# Method to fingerprint everything the bootstrap phase writes (schema, DDL, policies, root admin)
+def bootstrap_fingerprint() -> str:
+    digest = hashlib.sha256()
+    dialect = postgresql.dialect()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for ddl in EXTRA_DDL:
+        digest.update(ddl.encode())
+    with open(IAM_POLICY_FILE, "rb") as f:
+        digest.update(f.read())
+    digest.update(ROOT_EMAIL.encode())
+    return digest.hexdigest()
+
+
+async def _stored_fingerprint(conn):
+    try:
+        return await conn.scalar(select(SystemState.value).where(SystemState.key == BOOTSTRAP_STATE_KEY))
+    except DBAPIError:
+        # system_state does not exist yet on a fresh database
+        await conn.rollback()
+        return None
+
+
+# Method to run schema + seed work once per fingerprint across all workers
+async def bootstrap_database(timer: BootTimer) -> bool:
+    fingerprint = bootstrap_fingerprint()
+
+    # Fast boot path: nothing changed since the last bootstrap
+    if not STARTUP_FORCE_BOOTSTRAP:
+        async with engine.connect() as conn:
+            if await _stored_fingerprint(conn) == fingerprint:
+                return False
+
+    async with engine.connect() as lock_conn:
+        with timer.phase("bootstrap_lock_wait"):
+            await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+            await lock_conn.commit()
+
+        try:
+            # Another worker may have finished while we waited on the lock
+            async with engine.connect() as conn:
+                if not STARTUP_FORCE_BOOTSTRAP and await _stored_fingerprint(conn) == fingerprint:
+                    return False
+
+            with timer.phase("schema"):
+                await init_db()
+
+            with timer.phase("seed"):
+                async with AsyncSessionLocal() as db:
+                    await seed_system(db)
+
+            async with AsyncSessionLocal() as db:
+                stmt = insert(SystemState).values(key=BOOTSTRAP_STATE_KEY, value=fingerprint)
+                stmt = stmt.on_conflict_do_update(index_elements=[SystemState.key], set_={"value": fingerprint, "updated_at": func.now()})
+                await db.execute(stmt)
+                await db.commit()
+            return True
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+            await lock_conn.commit()
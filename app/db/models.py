@@ -2,4 +2,6 @@ from app.modules.users.model import *
 from app.modules.departments.model import *
 from app.modules.groups.model import *
 from app.modules.documents.model import *
-from app.modules.permissions.model import *
\ No newline at end of file
+from app.modules.permissions.model import *
+from app.modules.auth.model import *
+from app.modules.system.model import *
\ No newline at end of file
@@ -3,6 +3,10 @@ import os
 from .base import Base
 from .models import *
 from dotenv import load_dotenv
+from sqlalchemy import text
+from app.core.iam_events import IAM_TRIGGER_DDL
+from app.modules.documents.search import SEARCH_TRIGGER_DDL
+from app.modules.documents.clone import CLONE_DDL
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,13 +20,28 @@ DB_NAME = os.getenv("DB_NAME")
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Plain asyncpg DSN for dedicated LISTEN connections
+LISTEN_DSN = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
 # Create the async engine
 engine = create_async_engine(DATABASE_URL, echo=False, pool_size=20, max_overflow=10, pool_pre_ping=True)
 
 # Create the async session maker
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False, autocommit=False)
 
+# Raw DDL applied after create_all (functions, triggers)
+EXTRA_DDL = [*IAM_TRIGGER_DDL, *SEARCH_TRIGGER_DDL, *CLONE_DDL]
+
+# create_all skips tables that already exist; add indexes declared after they were created
+def _create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 # Function to initialize the database (create tables)
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        for ddl in EXTRA_DDL:
+            await conn.execute(text(ddl))
\ No newline at end of file
@@ -1,21 +1,60 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.db.session import init_db, AsyncSessionLocal
-from app.core.seed import seed_system
+from app.db.session import AsyncSessionLocal, LISTEN_DSN
+from app.core.startup import BootTimer, bootstrap_database
 from app.api import api_router
+from app.modules.wellknown.endpoints import router as wellknown_router
+from app.core.security import password_hash_pool
+from app.core.auth import AUTH_MODE
+from app.core.revocation import sync_revocations, run_revocation_sync
+from app.core.iam_events import run_iam_listener
+from app.core.permission_matrix import compile_permission_matrix, get_group_departments
+from app.core.iam_loader import run_iam_policy_watch, IAM_POLICY_WATCH_SECONDS
+from app.core.jwt.key_store import ensure_keys, run_key_rotation
+from app.modules.documents.retention import run_document_purge, DOCUMENT_RETENTION_DAYS
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 1 Database structure
-    await init_db()
+    boot = BootTimer()
 
-    # 2 System seeding (IAM, root admin, policies)
-    async with AsyncSessionLocal() as db:
-        await seed_system(db)
+    # 1 Database structure and system seeding (IAM, root admin, policies), once per fingerprint
+    with boot.phase("bootstrap"):
+        await bootstrap_database(boot)
 
+    # 2 In-memory permission matrix and group -> department membership
+    with boot.phase("permission_matrix"):
+        compile_permission_matrix()
+        async with AsyncSessionLocal() as db:
+            await get_group_departments(db)
+
+    # 3 Signing keys (current + pre-generated next) and their background rotation
+    with boot.phase("signing_keys"):
+        await asyncio.to_thread(ensure_keys)
+
+    # 4 Cross-worker invalidation of in-memory IAM state
+    background = [asyncio.create_task(run_iam_listener(LISTEN_DSN)), asyncio.create_task(run_key_rotation())]
+    if IAM_POLICY_WATCH_SECONDS > 0:
+        background.append(asyncio.create_task(run_iam_policy_watch(AsyncSessionLocal)))
+
+    # 5 Stateless auth keeps the revocation list in memory
+    if AUTH_MODE == "claims":
+        with boot.phase("revocations"):
+            async with AsyncSessionLocal() as db:
+                await sync_revocations(db)
+        background.append(asyncio.create_task(run_revocation_sync(AsyncSessionLocal)))
+
+    # 6 Purge of soft-deleted documents past their retention period
+    if DOCUMENT_RETENTION_DAYS > 0:
+        background.append(asyncio.create_task(run_document_purge(AsyncSessionLocal)))
+
+    boot.report()
     print("INFINTREE started")
     yield
+    for task in background:
+        task.cancel()
+    password_hash_pool.shutdown()
     print("INFINTREE shutdown")
 
 
@@ -31,6 +70,9 @@ def create_app() -> FastAPI:
     # Central API registry
     app.include_router(api_router, prefix="/api")
 
+    # Public discovery documents live at the root, outside /api
+    app.include_router(wellknown_router, tags=["Well-Known"])
+
     return app
 
 
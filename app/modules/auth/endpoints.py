@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.debs import get_db
 from typing import Annotated
-from .usecases import authenticate_user, update_user_password, get_roles
-from .schemas import SetPasswordRequest, RoleScope
+from .usecases import authenticate_user, update_user_password, get_roles, refresh_access_token, logout_session, get_sessions, revoke_session
+from .schemas import SetPasswordRequest, RoleScope, RefreshTokenRequest
 from app.core.permission_dependancy import require_permission
-from app.modules.users.model import User
+from app.core.auth import get_current_user
+from app.core.principal import Principal
 
 # Roter Initialization
 router = APIRouter()
@@ -16,8 +17,32 @@ db = Annotated[AsyncSession, Depends(get_db)]
 
 # Endpoint to handle user login
 @router.post("/login")
-async def login(db: db, form: OAuth2PasswordRequestForm = Depends()):
-    resp = await authenticate_user(db, form.username, form.password)
+async def login(db: db, request: Request, form: OAuth2PasswordRequestForm = Depends()):
+    resp = await authenticate_user(db, form.username, form.password, request.headers.get("user-agent"))
+    return resp
+
+# Endpoint to rotate a refresh token into a new access token
+@router.post("/refresh")
+async def refresh_endpoint(db: db, request: RefreshTokenRequest):
+    resp = await refresh_access_token(db, request)
+    return resp
+
+# Endpoint to end the session a refresh token belongs to
+@router.post("/logout")
+async def logout_endpoint(db: db, request: RefreshTokenRequest):
+    resp = await logout_session(db, request)
+    return resp
+
+# Endpoint to list the current user's active sessions
+@router.get("/sessions")
+async def get_sessions_endpoint(db: db, current_user: Principal = Depends(get_current_user)):
+    resp = await get_sessions(db, current_user.id)
+    return resp
+
+# Endpoint to revoke one device session of the current user
+@router.delete("/sessions/{session_id}")
+async def revoke_session_endpoint(db: db, session_id: str, current_user: Principal = Depends(get_current_user)):
+    resp = await revoke_session(db, current_user.id, session_id)
     return resp
 
 # Endpoint to change user's default password
@@ -28,6 +53,6 @@ async def set_password_endpoint(db: db, request: SetPasswordRequest):
 
 # Endpoint to get roles
 @router.get("/roles")
-async def get_roles_endpoint(db: db, scope: RoleScope, current_user: User = Depends(require_permission("user.read"))):
+async def get_roles_endpoint(db: db, scope: RoleScope, current_user: Principal = Depends(require_permission("user.read"))):
     resp = await get_roles(db, scope.value.lower())
     return resp
\ No newline at end of file
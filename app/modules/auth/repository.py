@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from app.modules.users.model import User, UserRole
 from app.modules.permissions.model import Role, Permission, RolePermission
+from .model import AuthSession
 
 # Method to get user by email
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
@@ -20,6 +21,17 @@ async def update_user(db: AsyncSession, user_id: str, **kwargs):
     result = await db.execute(stmt)
     await db.commit()
 
+# Method to replace a password hash only if nobody changed it in the meantime
+async def update_password_hash_if_unchanged(db: AsyncSession, user_id, old_hash: str, new_hash: str):
+    stmt = (
+        update(User)
+        .where(User.id == user_id, User.password_hash == old_hash)
+        .values(password_hash=new_hash)
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount > 0
+
 # Method to get user with role
 async def get_user_with_role(db: AsyncSession, email: str):
     stmt = (
@@ -67,4 +79,70 @@ async def get_roles_by_scope_type(db: AsyncSession, scope_type: str):
 async def get_role_by_id(db: AsyncSession, role_id: str):
     stmt = select(Role).where(Role.id == role_id)
     result = await db.execute(stmt)
-    return result.scalar_one_or_none()
\ No newline at end of file
+    return result.scalar_one_or_none()
+
+# Method to get every role grant of a user with its scope and permission codes
+async def get_user_grants(db: AsyncSession, user_id):
+    stmt = (
+        select(Role.name, UserRole.department_id, UserRole.group_id, Permission.code)
+        .join(Role, Role.id == UserRole.role_id)
+        .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+        .where(UserRole.user_id == user_id)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+
+# Method to get user by id
+async def get_user_by_id(db: AsyncSession, user_id) -> User | None:
+    stmt = select(User).where(User.id == user_id)
+    return await db.scalar(stmt)
+
+# Method to create a refresh-token session (committed by the caller)
+async def create_session(db: AsyncSession, **kwargs):
+    session = AuthSession(**kwargs)
+    db.add(session)
+    await db.flush()
+    return session
+
+# Method to get a session by refresh-token digest, locked for rotation
+async def get_session_for_update(db: AsyncSession, token_hash: str):
+    stmt = select(AuthSession).where(AuthSession.token_hash == token_hash).with_for_update()
+    return await db.scalar(stmt)
+
+# Method to get a user's active sessions (one per device family)
+async def get_active_sessions(db: AsyncSession, user_id):
+    stmt = (
+        select(AuthSession)
+        .where(
+            AuthSession.user_id == user_id,
+            AuthSession.rotated_at.is_(None),
+            AuthSession.revoked_at.is_(None),
+            AuthSession.expires_at > func.now()
+        )
+        .order_by(AuthSession.created_at.desc())
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+# Method to revoke every session of a family (one device)
+async def revoke_session_family(db: AsyncSession, family_id, user_id=None):
+    stmt = (
+        update(AuthSession)
+        .where(AuthSession.family_id == family_id, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=func.now())
+    )
+    if user_id is not None:
+        stmt = stmt.where(AuthSession.user_id == user_id)
+    result = await db.execute(stmt)
+    return result.rowcount > 0
+
+# Method to revoke every session of a user
+async def revoke_user_sessions(db: AsyncSession, user_id):
+    stmt = (
+        update(AuthSession)
+        .where(AuthSession.user_id == user_id, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=func.now())
+    )
+    await db.execute(stmt)
@@ -8,6 +8,10 @@ class SetPasswordRequest(BaseModel):
     new_password: str
     confirm_password: str
 
+# Schema for refresh / logout requests
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 # Enumuration for available roles scopes
 class RoleScope(str, Enum):
     SYSTEM = "system"
@@ -1,13 +1,64 @@
+import asyncio, os, uuid
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from .repository import get_user_by_email, update_user, get_user_with_role, get_role_and_permissions, get_roles_by_scope_type
-from app.core.security import verify_password, hash_password
-from app.core.jwt.issuer import create_access_token
+from .repository import get_user_by_email, update_user, get_user_with_role, get_role_and_permissions, get_roles_by_scope_type, get_user_by_id, create_session, get_session_for_update, get_active_sessions, revoke_session_family, revoke_user_sessions, update_password_hash_if_unchanged
+from app.core.security import verify_password_async, hash_password_async, generate_refresh_token, digest_refresh_token, password_needs_rehash
+from app.db.session import AsyncSessionLocal
+from app.core.jwt.issuer import create_access_token, JWT_EXP_MIN
 from app.core.security import validate_password_complexity
-from .schemas import SetPasswordRequest, RoleScope
+from app.core.revocation import revoke_user_tokens
+from .schemas import SetPasswordRequest, RoleScope, RefreshTokenRequest
+
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", 30))
+
+# Strong references to in-flight background rehash tasks
+_rehash_tasks = set()
+
+# Method to upgrade a hash made with outdated Argon2 parameters, after the response
+async def _rehash_password(user_id, password: str, old_hash: str):
+    try:
+        new_hash = await hash_password_async(password)
+        async with AsyncSessionLocal() as db:
+            await update_password_hash_if_unchanged(db, user_id, old_hash, new_hash)
+    except Exception as e:
+        # Saturated pool or DB hiccup: the next login tries again
+        print("PASSWORD REHASH SKIPPED:", e)
+
+def schedule_password_rehash(user_id, password: str, old_hash: str):
+    task = asyncio.create_task(_rehash_password(user_id, password, old_hash))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+# Method to mint an access token plus a rotating refresh token for a session family
+async def issue_tokens(db: AsyncSession, user, user_role, device: str | None, family_id=None):
+    role_data = await get_role_and_permissions(db, user_role.role_id)
+    if not role_data:
+        raise HTTPException(403, "Role misconfigured")
+
+    role_name, permissions = role_data
+
+    refresh_token = generate_refresh_token()
+    await create_session(
+        db,
+        user_id=user.id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=digest_refresh_token(refresh_token),
+        device=device[:200] if device else None,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DAYS),
+    )
+    await db.commit()
+
+    return {
+        "access_token": create_access_token(user, role_name, permissions, user_role, aud="infintree"),
+        "token_type": "bearer",
+        "expires_in": JWT_EXP_MIN * 60,
+        "refresh_token": refresh_token
+    }
 
 # Method to authenticate user and generate token
-async def authenticate_user(db: AsyncSession, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str, device: str | None = None):
     if not email or not password:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Email and password are required")
 
@@ -17,22 +68,80 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
     
     user, user_role = result
 
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid credentials")
 
+    if password_needs_rehash(user.password_hash):
+        schedule_password_rehash(user.id, password, user.password_hash)
+
     if user.default_password is True:
         raise HTTPException(status_code=status.HTTP_428_PRECONDITION_REQUIRED, detail="Password change required")
 
-    role_data = await get_role_and_permissions(db, user_role.role_id)
-    if not role_data:
-        raise HTTPException(403, "Role misconfigured")
+    return await issue_tokens(db, user, user_role, device)
 
-    role_name, permissions = role_data
+# Method to exchange a refresh token for a new access token (no password hashing involved)
+async def refresh_access_token(db: AsyncSession, request: RefreshTokenRequest):
+    session = await get_session_for_update(db, digest_refresh_token(request.refresh_token))
+    if not session or session.revoked_at is not None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid refresh token")
 
-    return {
-        "access_token": create_access_token(user, role_name, permissions, user_role, aud="infintree"),
-        "token_type": "bearer"
-    }
+    # Reuse of an already rotated token: assume it leaked and kill the whole device session
+    if session.rotated_at is not None:
+        await revoke_session_family(db, session.family_id)
+        await db.commit()
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Refresh token reuse detected")
+
+    now = datetime.now(timezone.utc)
+    if session.expires_at <= now:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Refresh token expired")
+
+    user = await get_user_by_id(db, session.user_id)
+    result = await get_user_with_role(db, user.email) if user else None
+    if not result:
+        await revoke_session_family(db, session.family_id)
+        await db.commit()
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "User no longer has access")
+
+    user, user_role = result
+    session.rotated_at = now
+
+    return await issue_tokens(db, user, user_role, session.device, family_id=session.family_id)
+
+# Method to revoke the device session a refresh token belongs to
+async def logout_session(db: AsyncSession, request: RefreshTokenRequest):
+    session = await get_session_for_update(db, digest_refresh_token(request.refresh_token))
+    if session:
+        await revoke_session_family(db, session.family_id)
+        await db.commit()
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Logged out successfully"})
+
+# Method to list the current user's active sessions
+async def get_sessions(db: AsyncSession, user_id: str):
+    sessions = await get_active_sessions(db, user_id)
+
+    return [
+        {
+            "session_id": str(s.family_id),
+            "device": s.device,
+            "last_refreshed_at": s.created_at,
+            "expires_at": s.expires_at
+        }
+        for s in sessions
+    ]
+
+# Method to revoke one of the current user's sessions (per device)
+async def revoke_session(db: AsyncSession, user_id: str, session_id: str):
+    try:
+        family_id = uuid.UUID(session_id)
+    except ValueError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+
+    if not await revoke_session_family(db, family_id, user_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    await db.commit()
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Session revoked successfully"})
 
 # Method to change user's default password
 async def update_user_password(db: AsyncSession, request: SetPasswordRequest):
@@ -43,7 +152,7 @@ async def update_user_password(db: AsyncSession, request: SetPasswordRequest):
     if user.default_password is False:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Password change not allowed for this user")
     
-    if not verify_password(request.old_password, user.password_hash):
+    if not await verify_password_async(request.old_password, user.password_hash):
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Old password is incorrect")
 
     if request.old_password == request.new_password:
@@ -55,9 +164,11 @@ async def update_user_password(db: AsyncSession, request: SetPasswordRequest):
     if not validate_password_complexity(request.new_password):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "New password does not meet complexity requirements")
     
-    hashed_password = hash_password(request.new_password)
+    hashed_password = await hash_password_async(request.new_password)
 
     await update_user(db, user.id, password_hash=hashed_password, default_password=False)
+    await revoke_user_sessions(db, user.id)
+    await revoke_user_tokens(db, user.id)
 
     return {"msg": "Password updated successfully"}
 
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from app.db.debs import get_db
 from app.core.permission_dependancy import require_permission
-from app.modules.users.model import User
+from app.core.principal import Principal
 from .schemas import CreateDepartmentRequest, UpdateDepartmentRequest, CreateDepartmentUserRequest
 from .usecases import create_department_usecase, get_all_departments_usecase, get_department_usecase, update_department_usecase, delete_department_usecase, create_department_user_usecase, get_all_users_in_departments_usecase, remove_user_from_department_usecase
 
@@ -15,47 +15,47 @@ db = Annotated[AsyncSession, Depends(get_db)]
 
 # Endpoint to create a new department
 @router.post("")
-async def create_department_endpoint(db: db, request: CreateDepartmentRequest, current_user: User = Depends(require_permission("departments.create"))):
+async def create_department_endpoint(db: db, request: CreateDepartmentRequest, current_user: Principal = Depends(require_permission("departments.create"))):
     resp = await create_department_usecase(db, request)
     return resp
 
 # Endpoint to get all departments or single department by ID
 @router.get("")
-async def get_all_departments_endpoint(db: db, department_id: str = None, current_user: User = Depends(require_permission("departments.read"))):
+async def get_all_departments_endpoint(db: db, department_id: str = None, if_none_match: str | None = Header(None), current_user: Principal = Depends(require_permission("departments.read"))):
 
     if department_id:
-        resp = await get_department_usecase(db, department_id)
+        resp = await get_department_usecase(db, department_id, if_none_match)
         return resp
     
-    resp = await get_all_departments_usecase(db)
+    resp = await get_all_departments_usecase(db, if_none_match)
     return resp
 
 # Endpoint to update a department by ID
 @router.put("")
-async def update_department_endpoint(db: db, department_id: str, request: UpdateDepartmentRequest, current_user: User = Depends(require_permission("departments.update"))):
+async def update_department_endpoint(db: db, department_id: str, request: UpdateDepartmentRequest, current_user: Principal = Depends(require_permission("departments.update"))):
     resp = await update_department_usecase(db, department_id, request)
     return resp
 
 # Endpoint to delete a department by ID
 @router.delete("")
-async def delete_department_endpoint(db: db, department_id: str, current_user: User = Depends(require_permission("departments.delete"))):
+async def delete_department_endpoint(db: db, department_id: str, current_user: Principal = Depends(require_permission("departments.delete"))):
     resp = await delete_department_usecase(db, department_id)
     return resp
 
 # Endpoint to create a new department user
 @router.post("/users")
-async def create_department_user_endpoint(db: db, request: CreateDepartmentUserRequest, current_user: User = Depends(require_permission("user.create"))):
+async def create_department_user_endpoint(db: db, request: CreateDepartmentUserRequest, current_user: Principal = Depends(require_permission("user.create"))):
     resp = await create_department_user_usecase(db, request)
     return resp
 
 # Endpoint to get all users in a department
 @router.get("/{department_id}/users")
-async def get_users_in_department_endpoint(db: db, department_id: str, current_user: User = Depends(require_permission("user.read"))):
+async def get_users_in_department_endpoint(db: db, department_id: str, current_user: Principal = Depends(require_permission("user.read"))):
     resp = await get_all_users_in_departments_usecase(db, department_id)
     return resp
 
 # Endpoint to remove a user from a department
 @router.delete("/{department_id}/users/{user_id}")
-async def remove_user_from_department_endpoint(db: db, department_id: str, user_id: str, current_user: User = Depends(require_permission("user.delete"))):
+async def remove_user_from_department_endpoint(db: db, department_id: str, user_id: str, current_user: Principal = Depends(require_permission("user.delete"))):
     resp = await remove_user_from_department_usecase(db, department_id, user_id)
     return resp
\ No newline at end of file
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func, cast, BigInteger
 from .model import Department
 from app.modules.users.model import User, UserRole
 
@@ -18,6 +18,21 @@ async def get_departments(db: AsyncSession):
     result = await db.execute(stmt)
     return result.scalars().all()
 
+# Method to fingerprint the department list: (count, newest change, sum of change times)
+async def get_departments_stamp(db: AsyncSession):
+    stmt = select(
+        func.count(),
+        func.max(Department.updated_at),
+        func.sum(cast(func.extract("epoch", Department.updated_at) * 1000000, BigInteger))
+    )
+    count, latest, total = (await db.execute(stmt)).one()
+    return count, latest.isoformat() if latest else None, total
+
+# Method to get when a department last changed
+async def get_department_updated_at(db: AsyncSession, department_id: str):
+    stmt = select(Department.updated_at).where(Department.id == department_id)
+    return await db.scalar(stmt)
+
 # Method to get a department by ID
 async def get_department(db: AsyncSession, department_id: str):
     stmt = select(Department).where(Department.id == department_id)
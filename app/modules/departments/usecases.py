@@ -3,9 +3,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from .schemas import CreateDepartmentRequest, UpdateDepartmentRequest, CreateDepartmentUserRequest
-from .repository import create_department, get_departments, get_department, get_department_by_name, update_department, delete_department, create_department_user, assign_user_to_department, get_user_by_email, get_users_in_department, get_user_by_id, delete_user_from_department, get_department_user
+from .repository import create_department, get_departments, get_departments_stamp, get_department_updated_at, get_department, get_department_by_name, update_department, delete_department, create_department_user, assign_user_to_department, get_user_by_email, get_users_in_department, get_user_by_id, delete_user_from_department, get_department_user
 from app.modules.auth.repository import get_role_by_id
-from app.core.security import hash_password
+from app.core.security import hash_password_async
+from app.core.revocation import revoke_user_tokens
+from app.core.http_cache import make_etag, etag_matches, not_modified, PRIVATE_REVALIDATE
 
 # Method to create a new department
 async def create_department_usecase(db: AsyncSession, request: CreateDepartmentRequest):
@@ -23,23 +25,37 @@ async def create_department_usecase(db: AsyncSession, request: CreateDepartmentR
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"msg": "Department created successfully"})
 
 # Method to get all departments
-async def get_all_departments_usecase(db: AsyncSession):
+async def get_all_departments_usecase(db: AsyncSession, if_none_match: str = None):
+    # Conditional GET: one aggregate instead of loading the list
+    etag = make_etag("departments", *await get_departments_stamp(db))
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+
     departments = await get_departments(db)
 
     if not departments:
         return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"departments": []})
     
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"departments": jsonable_encoder(departments)})
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"departments": jsonable_encoder(departments)}, headers=headers)
 
 # Method to get a department by ID
-async def get_department_usecase(db: AsyncSession, department_id: str):
-    
+async def get_department_usecase(db: AsyncSession, department_id: str, if_none_match: str = None):
+    # Conditional GET: the row's updated_at is its version
+    headers = {}
+    updated_at = await get_department_updated_at(db, department_id)
+    if updated_at is not None:
+        etag = make_etag("department", department_id, updated_at.isoformat())
+        headers = {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+        if etag_matches(if_none_match, etag):
+            return not_modified(headers)
+
     department = await get_department(db, department_id)
 
     if not department:
         return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"department": {}})
 
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"department": jsonable_encoder(department)})
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"department": jsonable_encoder(department)}, headers=headers)
 
 
 # Method to update a department
@@ -75,9 +91,14 @@ async def delete_department_usecase(db: AsyncSession, department_id: str):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
     
     # Step: 2 - Delete the department
+    members = await get_users_in_department(db, department_id)
     if not await delete_department(db, department_id):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unable to delete department")
-    
+
+    # Grants in the department are gone; tokens and cached principals carrying them must go too
+    for member in members:
+        await revoke_user_tokens(db, member.id)
+
     # Step: 3 - Return the deleted department
     return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Department deleted successfully"})
 
@@ -104,11 +125,12 @@ async def create_department_user_usecase(db: AsyncSession, payload: CreateDepart
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
 
     # Preparing the user data
+    password_hash = await hash_password_async(payload.password)
     user_data = {
         "first_name": payload.first_name,
         "last_name": payload.last_name,
         "email": payload.email,
-        "password_hash": hash_password(payload.password),
+        "password_hash": password_hash,
         "user_type": payload.user_type,
         "default_password": True,
     }
@@ -125,6 +147,9 @@ async def create_department_user_usecase(db: AsyncSession, payload: CreateDepart
     if not user_assign_resp:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unable to assign user to department")
 
+    # Every grant change bumps revocation, so no token or cached principal outlives it
+    await revoke_user_tokens(db, user_create_resp.id)
+
     # Step: 5 - Return the created department user
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"msg": "Department user created successfully"})
 
@@ -181,5 +206,8 @@ async def remove_user_from_department_usecase(db: AsyncSession, department_id: s
     if not await delete_user_from_department(db, user_id, department_id):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unable to remove user from department")
 
+    # Tokens carrying the removed role must stop working
+    await revoke_user_tokens(db, user_id)
+
     # Step: 5 - Return the removed user from the department
     return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "User removed from department successfully"})
\ No newline at end of file
@@ -0,0 +1,36 @@
+from sqlalchemy import Table, Column, MetaData, Index, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+
+# infintree_ulid(ms, prefix, seq) spells a ULID in Crockford base32: 48 bits of milliseconds,
+# then 40 random bits shared by one clone and a 40 bit sequence number. Ids handed out in
+# sequence order sort in that order, so a cloned tree keeps the sibling order of its source.
+CLONE_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION infintree_ulid(ms bigint, prefix bigint, seq bigint) RETURNS text AS $$
+        SELECT string_agg(
+            substr(
+                '0123456789ABCDEFGHJKMNPQRSTVWXYZ',
+                (((CASE WHEN i < 10 THEN ms WHEN i < 18 THEN prefix ELSE seq END)
+                  >> (5 * ((CASE WHEN i < 10 THEN 9 WHEN i < 18 THEN 17 ELSE 25 END) - i))) & 31)::int + 1,
+                1
+            ),
+            '' ORDER BY i
+        )
+        FROM generate_series(0, 25) AS i
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+]
+
+# Per-transaction scratch table mapping every source node to its copy; dropped at commit or rollback
+clone_map = Table(
+    "clone_map", MetaData(),
+    Column("old_id", String(26), primary_key=True),
+    Column("new_id", String(26), nullable=False),
+    Column("old_parent_id", String(26)),
+    Column("old_path", Text, nullable=False),
+    Column("old_document_id", UUID(as_uuid=True), nullable=False),
+    Column("new_document_id", UUID(as_uuid=True), nullable=False),
+    Index("clone_map_parent", "old_parent_id"),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP"
+)
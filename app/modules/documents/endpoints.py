@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
+import uuid
 from app.db.debs import get_db
 from app.core.permission_dependancy import require_permission
-from app.modules.users.model import User
-from .usecases import create_document_usecase, get_document_usecase, delete_document_usecase, update_document_usecase
-from .schemas import CreateDocumentRequest, DocumentDepthLevel, UpdateDocumentRequest
+from app.core.principal import Principal
+from .usecases import create_document_usecase, get_document_usecase, delete_document_usecase, update_document_usecase, search_documents_usecase, import_documents_usecase, move_document_usecase, clone_document_usecase, get_job_usecase, restore_document_usecase, NDJSON_MEDIA_TYPE, CHILDREN_PAGE_SIZE, CHILDREN_PAGE_MAX, SEARCH_PAGE_SIZE, SEARCH_PAGE_MAX
+from .schemas import CreateDocumentRequest, MoveDocumentRequest, CloneDocumentRequest, DOCUMENT_DEPTH_PATTERN, DOCUMENT_VIEW_PATTERN, UpdateDocumentRequest
 
 # Router initialization
 router = APIRouter(
@@ -18,14 +19,30 @@ db = Annotated[AsyncSession, Depends(get_db)]
 
 # Endpoint to create a new document
 @router.post("")
-async def create_document_endpoint(db: db, department_id: str, request: CreateDocumentRequest, current_user: User = Depends(require_permission("documents.create"))):
+async def create_document_endpoint(db: db, department_id: str, request: CreateDocumentRequest, current_user: Principal = Depends(require_permission("documents.create"))):
     resp = await create_document_usecase(db, department_id, request)
     return resp
 
+# Endpoint to bulk import a tree: a nested JSON body, or NDJSON lines with ref / parent_ref
+@router.post("/import")
+async def import_documents_endpoint(department_id: str, request: Request, parent_node_id: str | None = Query(None), db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.create"))):
+    return await import_documents_usecase(db, department_id, request, parent_node_id)
+
+# Endpoint to search documents (declared before /{node_id} so "search" is not taken for a node id)
+@router.get("/search")
+async def search_documents_endpoint(department_id: str, q: str = Query(..., min_length=1, max_length=200), node_id: str | None = Query(None), limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_PAGE_MAX), cursor: str | None = Query(None), db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.read"))):
+    return await search_documents_usecase(db, department_id, q, node_id, limit, cursor)
+
+# Endpoint to poll a background document job (e.g. a large clone)
+@router.get("/jobs/{job_id}")
+async def get_job_endpoint(department_id: str, job_id: uuid.UUID, db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.read"))):
+    return await get_job_usecase(db, department_id, job_id)
+
 # Endpoint to get a document
 @router.get("/{node_id}")
-async def get_document_endpoint(department_id: str, node_id: str, depth: DocumentDepthLevel = Query(DocumentDepthLevel.ZERO), db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.read"))):
-    return await get_document_usecase(db, department_id, node_id, depth.value)
+async def get_document_endpoint(department_id: str, node_id: str, depth: str = Query("0", pattern=DOCUMENT_DEPTH_PATTERN), cursor: str | None = Query(None), limit: int = Query(CHILDREN_PAGE_SIZE, ge=1, le=CHILDREN_PAGE_MAX), view: str = Query("full", pattern=DOCUMENT_VIEW_PATTERN), fields: str | None = Query(None), accept: str | None = Header(None), if_none_match: str | None = Header(None), db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.read"))):
+    stream = NDJSON_MEDIA_TYPE in (accept or "")
+    return await get_document_usecase(db, department_id, node_id, depth, stream, cursor, limit, view, fields, if_none_match)
 
 # Endpoint to update a document
 @router.put("/{node_id}")
@@ -35,4 +52,19 @@ async def update_document_endpoint(department_id: str, node_id: str, request: Up
 # Endpoint to delete a document
 @router.delete("/{node_id}")
 async def delete_document_endpoint(department_id: str, node_id: str, db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.delete"))):
-    return await delete_document_usecase(db, department_id, node_id)
\ No newline at end of file
+    return await delete_document_usecase(db, department_id, node_id)
+
+# Endpoint to restore a soft-deleted document and the descendants deleted with it
+@router.post("/{node_id}/restore")
+async def restore_document_endpoint(department_id: str, node_id: str, db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.restore"))):
+    return await restore_document_usecase(db, department_id, node_id)
+
+# Endpoint to move a document and its subtree under another parent
+@router.post("/{node_id}/move")
+async def move_document_endpoint(department_id: str, node_id: str, request: MoveDocumentRequest, db: AsyncSession = Depends(get_db), current_user=Depends(require_permission("document.update"))):
+    return await move_document_usecase(db, department_id, node_id, request)
+
+# Endpoint to clone a document and its subtree, optionally into another department (needs document.create there)
+@router.post("/{node_id}/clone")
+async def clone_document_endpoint(department_id: str, node_id: str, request: CloneDocumentRequest, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(require_permission("document.read"))):
+    return await clone_document_usecase(db, current_user, department_id, node_id, request)
@@ -31,4 +31,28 @@ class DocumentNode(Base):
     path: Mapped[str] = mapped_column(Text, nullable=False)
     deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
\ No newline at end of file
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+# Tree indexes over live nodes. Paths are compared bytewise (COLLATE "C") so a
+# subtree is one contiguous index range and comes back already in tree order.
+LIVE_NODE = DocumentNode.deleted_at.is_(None)
+Index("idx_document_nodes_subtree", DocumentNode.department_id, DocumentNode.path.collate("C"), postgresql_where=LIVE_NODE)
+Index("idx_document_nodes_children", DocumentNode.department_id, DocumentNode.parent_node_id, DocumentNode.path.collate("C"), postgresql_where=LIVE_NODE)
+
+# Soft-deleted rows are only reached by maintenance (move, restore, purge); they get their own small index
+DELETED_NODE = DocumentNode.deleted_at.is_not(None)
+Index("idx_document_nodes_deleted_subtree", DocumentNode.department_id, DocumentNode.path.collate("C"), postgresql_where=DELETED_NODE)
+
+# Long running document operations (e.g. cloning a very large subtree) run in the background; clients poll the row
+class DocumentJob(Base):
+    __tablename__ = "document_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    department_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("departments.id"))
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending / running / done / failed
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,6 +1,55 @@
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
-from .model import Document, DocumentNode
+from sqlalchemy import select, update, insert, delete, func, case, literal, literal_column, or_, and_, cast, true, text, tuple_, union_all, Integer, Text, BigInteger, Float
+from sqlalchemy.orm import aliased
+from .model import Document, DocumentNode, DocumentJob, LIVE_NODE, DELETED_NODE
+from .search import DOCUMENT_SEARCH_CONFIG, DOCUMENT_SEARCH_HEADLINE
+from .clone import clone_map
+
+# Rows fetched per round trip when streaming a subtree
+TREE_STREAM_BATCH = int(os.getenv("TREE_STREAM_BATCH", 500))
+
+# Path segments are joined with "."; "/" is the next byte, so every descendant
+# of P sorts inside [P, P + "/") under bytewise comparison
+PATH_SEPARATOR = "."
+_PATH_UPPER = chr(ord(PATH_SEPARATOR) + 1)
+
+# Bytewise path, the same expression the tree indexes are built on
+tree_path = DocumentNode.path.collate("C")
+
+# Document columns a read needs: the whole content, or only the given JSONB sub-paths
+# (fields=None is the full view; an empty list is a bare outline with titles only)
+def document_columns(fields: list[str] | None):
+    if fields is None:
+        return [Document.title, Document.content]
+    return [Document.title, *(
+        (Document.content[field] if "." not in field else Document.content[tuple(field.split("."))]).label(f"field_{i}")
+        for i, field in enumerate(fields)
+    )]
+
+# Node columns every tree read returns, ahead of the document columns
+NODE_COLUMNS = (DocumentNode.node_id, DocumentNode.parent_node_id, DocumentNode.path)
+
+# Length of one path segment: the separator plus a 26 character ULID
+PATH_SEGMENT_LENGTH = len(PATH_SEPARATOR) + 26
+
+# Method to select every row of a subtree, live and soft-deleted, each half through its own partial index
+# (plus extra_node_ids, looked up by primary key)
+def subtree_ids_including_deleted(department_id, path: str, extra_node_ids: list[str] = ()):
+    in_range = (DocumentNode.department_id == department_id, tree_path >= path, tree_path < path + _PATH_UPPER)
+    selects = [select(DocumentNode.node_id).where(*in_range, LIVE_NODE), select(DocumentNode.node_id).where(*in_range, DELETED_NODE)]
+    if extra_node_ids:
+        selects.append(select(DocumentNode.node_id).where(DocumentNode.node_id.in_(extra_node_ids)))
+    return union_all(*selects)
+
+# Method to build the index range filter for a live subtree (the root included)
+def subtree_filter(department_id, path: str):
+    return (
+        DocumentNode.department_id == department_id,
+        tree_path >= path,
+        tree_path < path + _PATH_UPPER,
+        LIVE_NODE
+    )
 
 # Method to create a new document
 async def create_document(db: AsyncSession, title: str, content):
@@ -10,9 +59,16 @@ async def create_document(db: AsyncSession, title: str, content):
     await db.refresh(document)
     return document
 
-# Method to get node by id
-async def get_node_by_id(db: AsyncSession, node_id: str):
+# Method to write one batch of imported documents and their nodes (the caller commits once at the end)
+async def insert_document_batch(db: AsyncSession, documents: list[dict], nodes: list[dict]):
+    await db.execute(insert(Document), documents)
+    await db.execute(insert(DocumentNode), nodes)
+
+# Method to get node by id; for_share keeps a concurrent move from rewriting its path until we commit
+async def get_node_by_id(db: AsyncSession, node_id: str, for_share: bool = False):
     stmt = select(DocumentNode).where(DocumentNode.node_id == node_id)
+    if for_share:
+        stmt = stmt.with_for_update(read=True).execution_options(populate_existing=True)
     result = await db.execute(stmt)
     return result.scalar_one_or_none()
 
@@ -39,33 +95,154 @@ async def get_node_with_document(db, department_id, node_id: str):
     result = await db.execute(stmt)
     return result.first()
 
+# Method to fingerprint what a read of node_id at `depth` returns, without loading content:
+# (row count, newest change, sum of change times) over the node and its descendants down to depth.
+# The sum moves even when a transaction commits an older now() than the current maximum.
+# Returns None when the node does not exist.
+async def get_subtree_stamp(db, department_id, node_id: str, depth: str):
+    changed = func.greatest(DocumentNode.updated_at, Document.updated_at)
+    stmt = (
+        select(func.count(), func.max(changed), func.sum(cast(func.extract("epoch", changed) * 1000000, BigInteger)))
+        .select_from(DocumentNode)
+        .join(Document, Document.id == DocumentNode.document_id)
+    )
+
+    if depth == "0":
+        stmt = stmt.where(DocumentNode.node_id == node_id, DocumentNode.department_id == department_id, LIVE_NODE)
+    else:
+        root = aliased(DocumentNode)
+        root_path = (
+            select(root.path)
+            .where(root.node_id == node_id, root.department_id == department_id, root.deleted_at.is_(None))
+            .scalar_subquery()
+        )
+        stmt = stmt.where(
+            DocumentNode.department_id == department_id,
+            tree_path >= root_path,
+            tree_path < root_path.concat(_PATH_UPPER),
+            LIVE_NODE
+        )
+        if depth != "all":
+            stmt = stmt.where(func.length(DocumentNode.path) <= func.length(root_path) + PATH_SEGMENT_LENGTH * int(depth))
+
+    count, latest, total = (await db.execute(stmt)).one()
+    if count == 0:
+        return None
+    return count, latest.isoformat(), total
 
-# Method to get immediate children
-async def get_immediate_children(db, department_id, parent_node_id: str):
+# Method to get a live node with the projected document columns
+async def get_node_view(db, department_id, node_id: str, fields: list[str] | None = None):
     stmt = (
-        select(DocumentNode, Document)
+        select(*NODE_COLUMNS, *document_columns(fields))
         .join(Document, Document.id == DocumentNode.document_id)
         .where(
+            DocumentNode.node_id == node_id,
             DocumentNode.department_id == department_id,
-            DocumentNode.parent_node_id == parent_node_id,
-            DocumentNode.deleted_at.is_(None)
+            LIVE_NODE
         )
-        .order_by(DocumentNode.path)
     )
     result = await db.execute(stmt)
+    return result.first()
+
+
+# Statement for a subtree cut at `depth` levels with at most `limit` children per node.
+# Each child page is an index range scan (LIMIT limit + 1, the extra row only signals
+# that more children exist); sentinel rows are never expanded. `after_path` resumes the
+# root's children after a keyset cursor.
+def tree_levels_stmt(department_id, node_id: str, depth: int, limit: int, after_path: str | None = None, fields: list[str] | None = None):
+    root = (
+        select(
+            DocumentNode.node_id, DocumentNode.parent_node_id, DocumentNode.path, DocumentNode.document_id,
+            literal(0, Integer).label("depth"), literal(1, BigInteger).label("rn")
+        )
+        .where(DocumentNode.node_id == node_id, DocumentNode.department_id == department_id, LIVE_NODE)
+        .cte("tree", recursive=True)
+    )
+
+    child = aliased(DocumentNode)
+    child_path = child.path.collate("C")
+    conditions = [child.department_id == department_id, child.parent_node_id == root.c.node_id, child.deleted_at.is_(None)]
+    if after_path is not None:
+        conditions.append(or_(root.c.depth > 0, child_path > after_path))
+
+    page = (
+        select(
+            child.node_id, child.parent_node_id, child.path, child.document_id,
+            func.row_number().over(order_by=child_path).label("rn")
+        )
+        .where(*conditions)
+        .order_by(child_path)
+        .limit(limit + 1)
+        .lateral("page")
+    )
+
+    tree = root.union_all(
+        select(page.c.node_id, page.c.parent_node_id, page.c.path, page.c.document_id, root.c.depth + 1, page.c.rn)
+        .select_from(root.join(page, true()))
+        .where(root.c.depth < depth, root.c.rn <= limit)
+    )
+
+    return (
+        select(tree.c.node_id, tree.c.parent_node_id, tree.c.path, tree.c.depth, tree.c.rn, *document_columns(fields))
+        .join(Document, Document.id == tree.c.document_id)
+        .order_by(tree.c.path.collate("C"))
+    )
+
+# Method to get a subtree down to `depth` levels with paginated children lists
+async def get_tree_levels(db, department_id, node_id: str, depth: int, limit: int, after_path: str | None = None, fields: list[str] | None = None):
+    result = await db.execute(tree_levels_stmt(department_id, node_id, depth, limit, after_path, fields))
     return result.all()
 
 # Method to get subtree
-async def get_subtree_nodes(db, department_id, path: str):
+async def get_subtree_nodes(db, department_id, path: str, fields: list[str] | None = None):
     stmt = (
-        select(DocumentNode, Document)
+        select(*NODE_COLUMNS, *document_columns(fields))
         .join(Document, Document.id == DocumentNode.document_id)
-        .where(
-            DocumentNode.department_id == department_id,
-            DocumentNode.path.startswith(path),
-            DocumentNode.deleted_at.is_(None)
-        )
-        .order_by(DocumentNode.path)
+        .where(*subtree_filter(department_id, path))
+        .order_by(tree_path)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+# Method to stream a subtree in tree order through a server-side cursor, one batch at a time
+async def stream_subtree_rows(db: AsyncSession, department_id, path: str, fields: list[str] | None = None):
+    stmt = (
+        select(*NODE_COLUMNS, *document_columns(fields))
+        .join(Document, Document.id == DocumentNode.document_id)
+        .where(*subtree_filter(department_id, path))
+        .order_by(tree_path)
+        .execution_options(yield_per=TREE_STREAM_BATCH)
+    )
+    result = await db.stream(stmt)
+    async for batch in result.partitions():
+        yield batch
+
+# Method to search live documents of a department (optionally one subtree), best match first.
+# Ranking runs over the GIN matches; snippets are only built for the returned page.
+async def search_documents(db, department_id, q: str, limit: int, path: str | None = None, after: tuple | None = None):
+    config = literal_column(f"'{DOCUMENT_SEARCH_CONFIG}'::regconfig")
+    query = func.websearch_to_tsquery(config, q)
+    rank = cast(func.ts_rank(Document.search_text, query), Float)
+
+    scope = subtree_filter(department_id, path) if path is not None else (DocumentNode.department_id == department_id, LIVE_NODE)
+    conditions = [*scope, Document.deleted_at.is_(None), Document.search_text.op("@@")(query)]
+    if after is not None:
+        after_rank, after_node_id = after
+        conditions.append(or_(rank < after_rank, and_(rank == after_rank, DocumentNode.node_id > after_node_id)))
+
+    page = (
+        select(*NODE_COLUMNS, Document.title, Document.content, rank.label("rank"))
+        .join(Document, Document.id == DocumentNode.document_id)
+        .where(*conditions)
+        .order_by(rank.desc(), DocumentNode.node_id)
+        .limit(limit)
+        .subquery("page")
+    )
+    snippet = func.ts_headline(config, func.infintree_document_text(page.c.content), query, DOCUMENT_SEARCH_HEADLINE)
+
+    stmt = (
+        select(page.c.node_id, page.c.parent_node_id, page.c.path, page.c.title, page.c.rank, snippet.label("snippet"))
+        .order_by(page.c.rank.desc(), page.c.node_id)
     )
     result = await db.execute(stmt)
     return result.all()
@@ -82,6 +259,145 @@ async def get_node(db, department_id, node_id: str):
     )
     return await db.scalar(stmt)
 
+# Method to lock nodes, in node_id order, and reload them
+# (read=True takes share locks: the nodes cannot be moved or deleted, but others may still lock them for reading)
+async def lock_nodes(db: AsyncSession, node_ids: list[str], read: bool = False):
+    stmt = (
+        select(DocumentNode)
+        .where(DocumentNode.node_id.in_(node_ids))
+        .order_by(DocumentNode.node_id)
+        .with_for_update(read=read)
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return {node.node_id: node for node in result.scalars().all()}
+
+# Method to lock every row of a subtree (live and deleted) plus extra nodes (e.g. a new parent) in ONE
+# statement, in node_id order. Tree writers (move, delete, restore) all lock this way before touching a
+# subtree, so two of them never hold locks the other waits for. A create under any descendant holds
+# FOR SHARE on its parent: it either commits first (and its child is seen by the rewrite that follows)
+# or waits and then reads the parent's new path. Returns the number of rows locked.
+async def lock_subtree(db: AsyncSession, department_id, path: str, extra_node_ids: list[str] = ()):
+    locked = (
+        select(DocumentNode.node_id)
+        .where(DocumentNode.node_id.in_(subtree_ids_including_deleted(department_id, path, extra_node_ids)))
+        .order_by(DocumentNode.node_id)
+        .with_for_update()
+        .subquery()
+    )
+    return await db.scalar(select(func.count()).select_from(locked))
+
+# Method to count the rows one delete stamped in a subtree (what a restore of it has to bring back)
+async def count_deleted_subtree(db, department_id, path: str, deleted_at):
+    stmt = (
+        select(func.count())
+        .select_from(DocumentNode)
+        .where(
+            DocumentNode.department_id == department_id,
+            tree_path >= path,
+            tree_path < path + _PATH_UPPER,
+            DELETED_NODE,
+            DocumentNode.deleted_at == deleted_at
+        )
+    )
+    return await db.scalar(stmt)
+
+# Statement re-rooting a subtree under new_path: every path (live and deleted descendants
+# alike) gets its old prefix swapped, and only the moved root changes parent
+def move_subtree_stmt(department_id, node_id: str, old_path: str, new_path: str, new_parent_node_id: str | None):
+    subtree = subtree_ids_including_deleted(department_id, old_path).cte("subtree")
+    return (
+        update(DocumentNode)
+        .where(DocumentNode.node_id == subtree.c.node_id)
+        .values(
+            path=literal(new_path) + func.substr(DocumentNode.path, len(old_path) + 1),
+            parent_node_id=case((DocumentNode.node_id == node_id, literal(new_parent_node_id, DocumentNode.parent_node_id.type)), else_=DocumentNode.parent_node_id)
+        )
+    )
+
+# Method to move a subtree in one statement, whatever its size
+async def move_subtree(db: AsyncSession, department_id, node_id: str, old_path: str, new_path: str, new_parent_node_id: str | None):
+    result = await db.execute(move_subtree_stmt(department_id, node_id, old_path, new_path, new_parent_node_id))
+    return result.rowcount
+
+# Method to count the live nodes of a subtree (index only, no documents touched)
+async def count_subtree(db, department_id, path: str):
+    return await db.scalar(select(func.count()).select_from(DocumentNode).where(*subtree_filter(department_id, path)))
+
+# Method to copy a live subtree under target_parent_path (None makes the copy a root) without the rows
+# leaving Postgres: map old ids to new ULIDs and fresh document ids, copy the documents, then walk the
+# map from the root to rebuild parent links and paths. Returns (new root id, copied nodes); no commit.
+async def clone_subtree(db: AsyncSession, department_id, node_id: str, path: str, target_department_id, target_parent_node_id: str | None, target_parent_path: str | None, ms: int, prefix: int):
+    await db.run_sync(lambda session: clone_map.create(session.connection()))
+
+    # Step 1: One new id per node, handed out in tree order
+    await db.execute(
+        insert(clone_map).from_select(
+            ["old_id", "new_id", "old_parent_id", "old_path", "old_document_id", "new_document_id"],
+            select(
+                DocumentNode.node_id,
+                func.infintree_ulid(literal(ms, BigInteger), literal(prefix, BigInteger), func.row_number().over(order_by=tree_path)),
+                DocumentNode.parent_node_id,
+                DocumentNode.path,
+                DocumentNode.document_id,
+                func.gen_random_uuid()
+            ).where(*subtree_filter(department_id, path))
+        )
+    )
+    await db.execute(text("ANALYZE clone_map"))
+
+    # Step 2: Documents, copied row for row
+    await db.execute(
+        insert(Document).from_select(
+            ["id", "title", "content"],
+            select(clone_map.c.new_document_id, Document.title, Document.content)
+            .join(Document, Document.id == clone_map.c.old_document_id)
+        )
+    )
+
+    # Step 3: Nodes, with paths rebuilt from the root down
+    root_path = literal(f"{target_parent_path}{PATH_SEPARATOR}" if target_parent_path else "") + clone_map.c.new_id
+    walk = (
+        select(
+            clone_map.c.old_id, clone_map.c.new_id, clone_map.c.new_document_id,
+            cast(literal(target_parent_node_id), Text).label("new_parent_id"),
+            root_path.label("new_path")
+        )
+        .where(clone_map.c.old_id == node_id)
+        .cte("walk", recursive=True)
+    )
+    child = clone_map.alias("child")
+    walk = walk.union_all(
+        select(child.c.old_id, child.c.new_id, child.c.new_document_id, cast(walk.c.new_id, Text), walk.c.new_path + PATH_SEPARATOR + child.c.new_id)
+        .join(walk, child.c.old_parent_id == walk.c.old_id)
+    )
+    result = await db.execute(
+        insert(DocumentNode).from_select(
+            ["node_id", "document_id", "parent_node_id", "department_id", "path"],
+            select(walk.c.new_id, walk.c.new_document_id, walk.c.new_parent_id, literal(target_department_id, DocumentNode.department_id.type), walk.c.new_path)
+        )
+    )
+
+    new_root_id = await db.scalar(select(clone_map.c.new_id).where(clone_map.c.old_id == node_id))
+    return new_root_id, result.rowcount
+
+# Method to create a background job record
+async def create_job(db: AsyncSession, kind: str, department_id, params: dict):
+    job = DocumentJob(kind=kind, department_id=department_id, params=params)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+# Method to get a job of a department
+async def get_job(db, department_id, job_id):
+    return await db.scalar(select(DocumentJob).where(DocumentJob.id == job_id, DocumentJob.department_id == department_id))
+
+# Method to record a job's progress
+async def set_job_status(db: AsyncSession, job_id, status: str, result: dict | None = None, error: str | None = None):
+    await db.execute(update(DocumentJob).where(DocumentJob.id == job_id).values(status=status, result=result, error=error))
+    await db.commit()
+
 # Method to update document
 async def update_document(db: AsyncSession, document, title: str, content: str):
     if title is not None:
@@ -96,30 +412,80 @@ async def update_document(db: AsyncSession, document, title: str, content: str):
 async def soft_delete_node_record(db: AsyncSession, department_id: str, path: str):
     now = func.now()
 
-    # Delete node
-    await db.execute(
+    # Delete nodes and the documents linked to them in one statement
+    deleted_nodes = (
         update(DocumentNode)
-        .where(
-            DocumentNode.department_id == department_id,
-            DocumentNode.path.startswith(path),
-            DocumentNode.deleted_at.is_(None)
-        )
+        .where(*subtree_filter(department_id, path))
         .values(deleted_at=now)
+        .returning(DocumentNode.document_id)
+        .cte("deleted_nodes")
     )
-
-    # Delete document linked to those nodes
     await db.execute(
         update(Document)
+        .where(Document.id.in_(select(deleted_nodes.c.document_id)))
+        .values(deleted_at=now)
+    )
+
+    await db.commit()
+
+# Statement restoring what one delete removed: the deleted rows of the subtree stamped with the
+# root's deleted_at (descendants deleted earlier, on their own, stay deleted)
+def restore_subtree_stmt(department_id, path: str, deleted_at):
+    restored_nodes = (
+        update(DocumentNode)
         .where(
-            Document.id.in_(
-                select(DocumentNode.document_id)
-                .where(
-                    DocumentNode.department_id == department_id,
-                    DocumentNode.path.startswith(path),
-                )
-            )
+            DocumentNode.department_id == department_id,
+            tree_path >= path,
+            tree_path < path + _PATH_UPPER,
+            DELETED_NODE,
+            DocumentNode.deleted_at == deleted_at
         )
-        .values(deleted_at=now)
+        .values(deleted_at=None)
+        .returning(DocumentNode.document_id)
+        .cte("restored_nodes")
+    )
+    return (
+        update(Document)
+        .where(Document.id.in_(select(restored_nodes.c.document_id)))
+        .values(deleted_at=None)
+    )
+
+# Method to restore a soft-deleted subtree in one statement; returns the restored rows (no commit)
+async def restore_subtree(db: AsyncSession, department_id, path: str, deleted_at):
+    result = await db.execute(restore_subtree_stmt(department_id, path, deleted_at))
+    return result.rowcount
+
+# Statement hard-deleting up to `limit` nodes soft-deleted before `cutoff`, with their documents.
+# It walks the deleted-rows index in (department_id, path) order from the `after` keyset and skips
+# rows another transaction holds (e.g. a restore in progress).
+def purge_batch_stmt(cutoff, limit: int, after: tuple | None = None):
+    batch = (
+        select(DocumentNode.node_id)
+        .where(DELETED_NODE, DocumentNode.deleted_at < cutoff)
+        .order_by(DocumentNode.department_id, tree_path)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if after is not None:
+        batch = batch.where(tuple_(DocumentNode.department_id, tree_path) > tuple_(*after))
+    batch = batch.cte("batch")
+
+    purged_nodes = (
+        delete(DocumentNode)
+        .where(DocumentNode.node_id.in_(select(batch.c.node_id)))
+        .returning(DocumentNode.document_id, DocumentNode.department_id, DocumentNode.path)
+        .cte("purged_nodes")
+    )
+    purged_documents = (
+        delete(Document)
+        .where(Document.id.in_(select(purged_nodes.c.document_id)))
+        .cte("purged_documents")
     )
+    return select(purged_nodes.c.department_id, purged_nodes.c.path).add_cte(purged_documents)
 
-    await db.commit()
\ No newline at end of file
+# Method to purge one batch; returns (purged rows, keyset to resume after), no commit
+async def purge_deleted_batch(db: AsyncSession, cutoff, limit: int, after: tuple | None = None):
+    rows = (await db.execute(purge_batch_stmt(cutoff, limit, after))).all()
+    if not rows:
+        return 0, after
+    return len(rows), tuple(max(rows))
@@ -0,0 +1,51 @@
+import asyncio, os
+from datetime import timedelta
+from sqlalchemy import func, text
+from app.core import metrics
+from .repository import purge_deleted_batch
+
+# Soft-deleted documents are purged for good after this many days (0 keeps them forever)
+DOCUMENT_RETENTION_DAYS = float(os.getenv("DOCUMENT_RETENTION_DAYS", 0))
+DOCUMENT_PURGE_BATCH = int(os.getenv("DOCUMENT_PURGE_BATCH", 1000))
+# Pause between batches, so purging never competes with live traffic for long
+DOCUMENT_PURGE_PAUSE = float(os.getenv("DOCUMENT_PURGE_PAUSE", 0.2))
+DOCUMENT_PURGE_INTERVAL = float(os.getenv("DOCUMENT_PURGE_INTERVAL", 3600))
+
+# Only one worker purges at a time
+DOCUMENT_PURGE_LOCK_KEY = 0x1A3_0003
+
+
+# Method to purge everything past retention, one short transaction per batch; returns the purged node count
+async def purge_deleted_documents(session_factory, retention_days: float = DOCUMENT_RETENTION_DAYS, batch_size: int = DOCUMENT_PURGE_BATCH):
+    cutoff = func.now() - timedelta(days=retention_days)
+    after = None
+    total = 0
+
+    while True:
+        async with session_factory() as db:
+            # Another worker is already at it
+            if not await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DOCUMENT_PURGE_LOCK_KEY}):
+                return total
+
+            purged, after = await purge_deleted_batch(db, cutoff, batch_size, after)
+            await db.commit()
+
+        if purged == 0:
+            return total
+        total += purged
+        metrics.incr("documents.purged", purged)
+        await asyncio.sleep(DOCUMENT_PURGE_PAUSE)
+
+
+# Background loop applying the retention period
+async def run_document_purge(session_factory):
+    while True:
+        try:
+            purged = await purge_deleted_documents(session_factory)
+            if purged:
+                print("DOCUMENT PURGE:", purged, "nodes")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("DOCUMENT PURGE ERROR:", e)
+        await asyncio.sleep(DOCUMENT_PURGE_INTERVAL)
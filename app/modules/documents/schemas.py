@@ -1,6 +1,6 @@
+import re, uuid
 from pydantic import BaseModel
 from typing import Any, Optional
-from enum import Enum
 
 # Schema model for create document request
 class CreateDocumentRequest(BaseModel):
@@ -8,13 +8,27 @@ class CreateDocumentRequest(BaseModel):
     content: Any
     parent_node_id: Optional[str] = None
 
-# Enumuration for document depth levels
-class DocumentDepthLevel(str, Enum):
-    ZERO = "0"
-    ONE = "1"
-    ALL = "all"
+# Accepted document depth levels: a number of levels or the whole subtree
+DOCUMENT_DEPTH_PATTERN = r"^(all|[0-9]+)$"
+MAX_TREE_DEPTH = 100
+
+# Document views: full content, or an outline without it (plus optional content sub-paths via fields=)
+DOCUMENT_VIEW_PATTERN = r"^(full|outline)$"
+CONTENT_FIELD_RE = re.compile(r"^[A-Za-z0-9_-]+(\.[A-Za-z0-9_-]+)*$")
+MAX_CONTENT_FIELDS = 20
 
 # Schema model for update document request
 class UpdateDocumentRequest(BaseModel):
     title: str | None = None
-    content: Any | None = None
\ No newline at end of file
+    content: Any | None = None
+
+# Schema model for move document request (no new parent makes the node a root)
+class MoveDocumentRequest(BaseModel):
+    new_parent_node_id: str | None = None
+
+# Schema model for clone document request: the copy goes under target_parent_node_id (or becomes a root)
+# in target_department_id (default: the source department); run_async forces a background job
+class CloneDocumentRequest(BaseModel):
+    target_department_id: uuid.UUID | None = None
+    target_parent_node_id: str | None = None
+    run_async: bool = False
@@ -0,0 +1,35 @@
+import os, re
+
+# Text search configuration used for both indexing and querying
+DOCUMENT_SEARCH_CONFIG = os.getenv("DOCUMENT_SEARCH_CONFIG", "english")
+if not re.fullmatch(r"[a-z_]+", DOCUMENT_SEARCH_CONFIG):
+    raise ValueError(f"Invalid DOCUMENT_SEARCH_CONFIG: {DOCUMENT_SEARCH_CONFIG!r}")
+
+# ts_headline options for search snippets
+DOCUMENT_SEARCH_HEADLINE = "MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>"
+
+# documents.search_text is kept up to date by a trigger: the title weighs A, every string
+# value found anywhere in the content JSON weighs B. Existing rows are backfilled once.
+SEARCH_TRIGGER_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION infintree_document_text(content jsonb) RETURNS text AS $$
+        SELECT coalesce(string_agg(value #>> '{}', ' '), '')
+        FROM jsonb_path_query(coalesce(content, '{}'::jsonb), 'strict $.**') AS value
+        WHERE jsonb_typeof(value) = 'string'
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION infintree_documents_search_text() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_text :=
+            setweight(to_tsvector('{DOCUMENT_SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('{DOCUMENT_SEARCH_CONFIG}', infintree_document_text(NEW.content)), 'B');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS infintree_documents_search ON documents",
+    "CREATE TRIGGER infintree_documents_search BEFORE INSERT OR UPDATE OF title, content ON documents "
+    "FOR EACH ROW EXECUTE FUNCTION infintree_documents_search_text()",
+    "UPDATE documents SET title = title WHERE search_text IS NULL",
+]
@@ -1,10 +1,17 @@
+import asyncio, hashlib, json, os, secrets, time
 from fastapi import HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from .repository import get_node_by_id, create_document, create_node_record, get_node_with_document, get_subtree_nodes, get_immediate_children, soft_delete_node_record, get_node, update_document
-from .utilis import generate_ulid, build_tree_response
-from .schemas import CreateDocumentRequest, UpdateDocumentRequest
+from app.db.session import AsyncSessionLocal
+from app.core import metrics
+from app.core.render_cache import render_cache
+from app.core.principal import Principal
+from app.modules.departments.repository import get_department
+from app.core.http_cache import make_etag, etag_matches, not_modified, PRIVATE_REVALIDATE
+from .repository import PATH_SEPARATOR, get_node_by_id, create_document, create_node_record, get_node_with_document, get_node_view, get_subtree_stamp, get_subtree_nodes, get_tree_levels, soft_delete_node_record, get_node, update_document, stream_subtree_rows, search_documents, insert_document_batch, lock_nodes, lock_subtree, move_subtree, count_subtree, clone_subtree, create_job, get_job, set_job_status, restore_subtree, count_deleted_subtree
+from .utilis import generate_ulid, build_tree_response, ndjson_lines, build_levels_response, decode_cursor, encode_cursor, NODE_ID_RE, node_payload, TreeImportPlanner, nested_import_items, ndjson_import_items
+from .schemas import CreateDocumentRequest, UpdateDocumentRequest, MoveDocumentRequest, CloneDocumentRequest, CONTENT_FIELD_RE, MAX_CONTENT_FIELDS, MAX_TREE_DEPTH
 
 # Method to create a new document
 async def create_document_usecase(db: AsyncSession, department_id: str, payload: CreateDocumentRequest):
@@ -18,7 +25,7 @@ async def create_document_usecase(db: AsyncSession, department_id: str, payload:
     node_id = generate_ulid()
     
     if payload.parent_node_id is not None:
-        parent = await get_node_by_id(db, payload.parent_node_id)
+        parent = await get_node_by_id(db, payload.parent_node_id, for_share=True)
 
         if parent is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent Document not found")
@@ -32,6 +39,7 @@ async def create_document_usecase(db: AsyncSession, department_id: str, payload:
     
     # Step 3: Create a new node record
     node = await create_node_record(db, node_id, document.id, payload.parent_node_id, department_id, PATH)
+    await render_cache.invalidate(db, department_id)
 
     # Preparing the return response
     result = {
@@ -43,50 +51,208 @@ async def create_document_usecase(db: AsyncSession, department_id: str, payload:
     return JSONResponse(status_code=status.HTTP_201_CREATED, content=jsonable_encoder(result))
 
 
-# Method to get a document
-async def get_document_usecase(db, department_id, node_id: str, depth: str):
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Children returned per node and per page for depth=N reads
+CHILDREN_PAGE_SIZE = int(os.getenv("DOCUMENT_CHILDREN_PAGE_SIZE", 100))
+CHILDREN_PAGE_MAX = int(os.getenv("DOCUMENT_CHILDREN_PAGE_MAX", 1000))
+
+# Search results per page
+SEARCH_PAGE_SIZE = int(os.getenv("DOCUMENT_SEARCH_PAGE_SIZE", 20))
+SEARCH_PAGE_MAX = int(os.getenv("DOCUMENT_SEARCH_PAGE_MAX", 100))
+
+# Bulk import: rows per INSERT batch and nodes per request
+IMPORT_BATCH_SIZE = int(os.getenv("DOCUMENT_IMPORT_BATCH_SIZE", 1000))
+IMPORT_MAX_NODES = int(os.getenv("DOCUMENT_IMPORT_MAX_NODES", 200000))
+
+
+# Method to stream a subtree as NDJSON; runs on its own session because it outlives the request's
+async def _stream_subtree(department_id, path: str, fields: list[str] | None):
+    async with AsyncSessionLocal() as db:
+        async for batch in stream_subtree_rows(db, department_id, path, fields):
+            yield ndjson_lines(batch, fields)
+
+
+# Method to turn view / fields query parameters into the content projection (None = full content)
+def _content_fields(view: str, fields: str | None):
+    if fields is None:
+        return [] if view == "outline" else None
+
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if len(names) > MAX_CONTENT_FIELDS or not all(CONTENT_FIELD_RE.match(name) for name in names):
+        raise HTTPException(400, "Invalid fields parameter")
+
+    # A field already covered by a broader one (meta.tags under meta) is dropped, whatever the order
+    names = list(dict.fromkeys(names))
+    return [name for name in names if not any(name.startswith(other + ".") for other in names)]
+
+
+# Method to bound and normalize depth before it reaches SQL ("007" and "7" are the same read)
+def _tree_depth(depth: str):
+    if depth == "all":
+        return depth
+    if not depth.isdigit() or int(depth) > MAX_TREE_DEPTH:
+        raise HTTPException(400, f"depth must be 'all' or a number up to {MAX_TREE_DEPTH}")
+    return str(int(depth))
+
+
+# Method to import a whole tree (nested JSON or NDJSON) under parent_node_id, or as new roots, in one transaction
+async def import_documents_usecase(db: AsyncSession, department_id: str, request, parent_node_id: str | None = None):
+    started = time.perf_counter()
+
+    # The parent is share-locked so a concurrent move cannot rewrite its path under the import
+    parent_path = None
+    if parent_node_id is not None:
+        parent = await get_node_by_id(db, parent_node_id, for_share=True)
+        if parent is None or parent.deleted_at is not None or str(parent.department_id) != str(department_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent Document not found")
+        parent_path = parent.path
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("content-type", ""):
+        items = ndjson_import_items(request.stream())
+    else:
+        try:
+            items = nested_import_items(await request.json())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body")
+
+    # Ids and paths are assigned in memory; rows go out in batches, nothing is committed until the end
+    planner = TreeImportPlanner(department_id, parent_node_id, parent_path, IMPORT_MAX_NODES)
+    documents, nodes = [], []
+    try:
+        async for ref, parent_ref, title, content in items:
+            document, node = planner.add(ref, parent_ref, title, content)
+            documents.append(document)
+            nodes.append(node)
+            if len(nodes) >= IMPORT_BATCH_SIZE:
+                await insert_document_batch(db, documents, nodes)
+                documents, nodes = [], []
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if planner.count == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to import")
+    if nodes:
+        await insert_document_batch(db, documents, nodes)
+
+    await db.commit()
+    await render_cache.invalidate(db, department_id)
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("documents.import", elapsed)
+    metrics.incr("documents.imported", planner.count)
+
+    result = {
+        "imported": planner.count,
+        "root_node_ids": planner.roots,
+        "seconds": round(elapsed, 3),
+        "nodes_per_second": round(planner.count / elapsed) if elapsed > 0 else None
+    }
+    return JSONResponse(status_code=status.HTTP_201_CREATED, content=result)
+
+
+# Method to get a document; rendered bodies are served from the render cache until the department changes,
+# and a client already holding the current ETag gets a 304 without any content being loaded
+async def get_document_usecase(db, department_id, node_id: str, depth: str, stream: bool = False, cursor: str | None = None, limit: int = CHILDREN_PAGE_SIZE, view: str = "full", fields: str | None = None, if_none_match: str | None = None):
+    content_fields = _content_fields(view, fields)
+    depth = _tree_depth(depth)
+    stream = stream and depth == "all"
+    key = hashlib.sha256(json.dumps([node_id, depth, stream, cursor, limit, content_fields]).encode()).hexdigest()
+
+    # Cached entries hold "<etag>\n<body>"
+    version = render_cache.version(department_id)
+    cached = None if stream else render_cache.get(department_id, version, key)
+    if cached is not None:
+        etag, _, body = cached.partition(b"\n")
+        etag = etag.decode()
+        headers = {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+        if etag_matches(if_none_match, etag):
+            return not_modified(headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # One aggregate over the index range answers the conditional request
+    stamp = await get_subtree_stamp(db, department_id, node_id, depth)
+    if stamp is None:
+        raise HTTPException(404, "Document not found")
+
+    etag = make_etag(department_id, key, *stamp)
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+
+    # NDJSON streams are never buffered
+    result = await _render_document(db, department_id, node_id, depth, stream, cursor, limit, content_fields)
+    if stream:
+        result.headers.update(headers)
+        return result
+
+    body = json.dumps(result, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode()
+    render_cache.put(department_id, version, key, etag.encode() + b"\n" + body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _render_document(db, department_id, node_id: str, depth: str, stream: bool, cursor: str | None, limit: int, content_fields: list[str] | None):
 
     # Step 1: Fetch base node
-    row = await get_node_with_document(db, department_id, node_id)
+    row = await get_node_view(db, department_id, node_id, content_fields)
     if not row:
         raise HTTPException(404, "Document not found")
 
-    node, document = row
+    node_id, parent_node_id, path, *values = row
 
-    base_response = {
-        "node_id": node.node_id,
-        "title": document.title,
-        "content": document.content,
-        "parent_node_id": node.parent_node_id,
-        "children": []
-    }
+    # depth = all as NDJSON → one node per line in tree order, parents before children
+    if depth == "all" and stream:
+        return StreamingResponse(_stream_subtree(department_id, path, content_fields), media_type=NDJSON_MEDIA_TYPE)
+
+    # depth = all → full subtree
+    if depth == "all":
+        rows = await get_subtree_nodes(db, department_id, path, content_fields)
+        return build_tree_response(rows, content_fields)
+
+    if not depth.isdigit():
+        raise HTTPException(400, "Invalid depth parameter")
 
     # depth = 0 → only this node
     if depth == "0":
-        return base_response
-
-    # depth = 1 → only immediate children
-    if depth == "1":
-        children = await get_immediate_children(db, department_id, node.node_id)
-
-        base_response["children"] = [
-            {
-                "node_id": child.node_id,
-                "title": doc.title,
-                "content": doc.content,
-                "parent_node_id": child.parent_node_id,
-                "children": []
-            }
-            for child, doc in children
-        ]
-        return base_response
+        return node_payload(node_id, parent_node_id, path, values, content_fields)
 
-    # depth = all → full subtree
-    if depth == "all":
-        rows = await get_subtree_nodes(db, department_id, node.path)
-        return build_tree_response(rows)
+    # depth = N → N levels, children lists paged by keyset cursor
+    after_path = None
+    if cursor is not None:
+        position = decode_cursor(cursor, NODE_ID_RE, NODE_ID_RE)
+        if position is None or position[0] != node_id:
+            raise HTTPException(400, "Invalid cursor")
+        after_path = f"{path}{PATH_SEPARATOR}{position[1]}"
+
+    rows = await get_tree_levels(db, department_id, node_id, int(depth), limit, after_path, content_fields)
+    return build_levels_response(rows, limit, content_fields)
 
-    raise HTTPException(400, "Invalid depth parameter")
+
+# Method to search documents of a department, optionally inside the subtree of node_id
+async def search_documents_usecase(db, department_id, q: str, node_id: str | None = None, limit: int = SEARCH_PAGE_SIZE, cursor: str | None = None):
+    path = None
+    if node_id is not None:
+        node = await get_node(db, department_id, node_id)
+        if not node:
+            raise HTTPException(404, "Document not found")
+        path = node.path
+
+    after = None
+    if cursor is not None:
+        after = decode_cursor(cursor, (int, float), NODE_ID_RE)
+        if after is None:
+            raise HTTPException(400, "Invalid cursor")
+
+    # One extra row tells whether another page exists
+    rows = await search_documents(db, department_id, q, limit + 1, path, after)
+
+    results = [
+        {"node_id": node_id, "parent_node_id": parent_node_id, "path": path, "title": title, "rank": rank, "snippet": snippet}
+        for node_id, parent_node_id, path, title, rank, snippet in rows[:limit]
+    ]
+    next_cursor = encode_cursor(results[-1]["rank"], results[-1]["node_id"]) if len(rows) > limit else None
+
+    return {"results": results, "next_cursor": next_cursor}
 
 
 # Mehtod to update a document
@@ -101,17 +267,199 @@ async def update_document_usecase(db: AsyncSession, department_id: str, node_id:
 
     # Step 2: Update the document
     await update_document(db, document, payload.title, payload.content)
+    await render_cache.invalidate(db, department_id)
 
     return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document updated successfully", "node_id": node.node_id})
 
+# Method to lock a node's whole subtree (live and deleted rows) together with extra nodes in one ordered
+# statement, then reload the locked rows. Move, delete and restore all lock this way, so none of them can
+# deadlock another; a node moved between the first read and the lock gives 409.
+async def _lock_tree(db: AsyncSession, department_id: str, node_id: str, extra_node_ids: list[str] = ()):
+    node = await get_node_by_id(db, node_id)
+    if node is None or str(node.department_id) != str(department_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    path = node.path
+    await lock_subtree(db, department_id, path, list(extra_node_ids))
+    locked = await lock_nodes(db, [node_id, *extra_node_ids])
+    node = locked.get(node_id)
+    if node is None or node.path != path:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Document changed concurrently, retry")
+    return node, locked
+
 # Method to delete a document
 async def delete_document_usecase(db: AsyncSession, department_id: str, node_id: str):
-    # Step 1: Check if the document exists
-    document = await get_node(db, department_id, node_id)
-    if not document:
+    # Step 1: Lock the document with its subtree, so a concurrent move cannot shift the path range
+    node, _ = await _lock_tree(db, department_id, node_id)
+    if node.deleted_at is not None:
         raise HTTPException(404, "Document not found")
 
     # Step 2: Soft delete the document
-    await soft_delete_node_record(db, department_id, document.path)
+    await soft_delete_node_record(db, department_id, node.path)
+    await render_cache.invalidate(db, department_id)
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document deleted successfully"})
+
+
+# Method to restore a soft-deleted node together with the descendants removed by the same delete
+async def restore_document_usecase(db: AsyncSession, department_id: str, node_id: str):
+    # Step 1: Lock the deleted subtree with the parent, which has to be live for the subtree to be reachable again
+    node = await get_node_by_id(db, node_id)
+    if node is None or str(node.department_id) != str(department_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    parent_node_id = node.parent_node_id
+    node, locked = await _lock_tree(db, department_id, node_id, [] if parent_node_id is None else [parent_node_id])
+    if node.parent_node_id != parent_node_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Document changed concurrently, retry")
+    if node.deleted_at is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Document is not deleted")
+
+    if parent_node_id is not None:
+        parent = locked.get(parent_node_id)
+        if parent is None or parent.deleted_at is not None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Parent Document is deleted; restore it first")
+
+    # Step 2: Restore the subtree in one statement; every row the delete stamped has to come back
+    expected = await count_deleted_subtree(db, department_id, node.path, node.deleted_at)
+    restored = await restore_subtree(db, department_id, node.path, node.deleted_at)
+    if restored != expected:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Document changed concurrently, retry")
+    await db.commit()
+    await render_cache.invalidate(db, department_id)
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document restored successfully", "node_id": node_id, "path": node.path, "restored": restored})
+
+
+# Method to move a node (with its whole subtree) under another parent of the same department
+async def move_document_usecase(db: AsyncSession, department_id: str, node_id: str, payload: MoveDocumentRequest):
+    new_parent_node_id = payload.new_parent_node_id
+
+    # Step 1: Lock the subtree and the new parent, then validate against the locked rows
+    node, locked = await _lock_tree(db, department_id, node_id, [] if new_parent_node_id is None else [new_parent_node_id])
+    if node.deleted_at is not None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    if new_parent_node_id is None:
+        new_path = node.node_id
+    else:
+        parent = locked.get(new_parent_node_id)
+        if parent is None or parent.deleted_at is not None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent Document not found")
+        if str(parent.department_id) != str(department_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent Document does not belong to the same department")
+        if parent.path == node.path or parent.path.startswith(node.path + PATH_SEPARATOR):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot move a document under itself or its descendants")
+        new_path = f"{parent.path}{PATH_SEPARATOR}{node.node_id}"
 
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document deleted successfully"})
\ No newline at end of file
+    if new_path == node.path:
+        return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document already in place", "node_id": node.node_id, "path": node.path, "moved": 0})
+
+    # Step 2: Rewrite the whole subtree in one statement
+    moved = await move_subtree(db, department_id, node.node_id, node.path, new_path, new_parent_node_id)
+    await db.commit()
+    await render_cache.invalidate(db, department_id)
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "Document moved successfully", "node_id": node_id, "path": new_path, "moved": moved})
+
+
+# Subtrees above this many nodes are cloned by a background job instead of inside the request
+CLONE_SYNC_MAX = int(os.getenv("DOCUMENT_CLONE_SYNC_MAX", 20000))
+
+# Strong references to in-flight background jobs
+_job_tasks = set()
+
+# Method to clone a subtree in one transaction; the source root and the target parent are share-locked
+# so neither can be moved or deleted while the copy is made
+async def _clone_document(db: AsyncSession, department_id: str, node_id: str, target_department_id: str, target_parent_node_id: str | None):
+    started = time.perf_counter()
+
+    locked = await lock_nodes(db, [node_id] if target_parent_node_id is None else [node_id, target_parent_node_id], read=True)
+    node = locked.get(node_id)
+    if node is None or str(node.department_id) != str(department_id) or node.deleted_at is not None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    target_parent_path = None
+    if target_parent_node_id is not None:
+        parent = locked.get(target_parent_node_id)
+        if parent is None or parent.deleted_at is not None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent Document not found")
+        if str(parent.department_id) != str(target_department_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent Document does not belong to the target department")
+        target_parent_path = parent.path
+
+    new_root_id, cloned = await clone_subtree(
+        db, department_id, node.node_id, node.path, target_department_id, target_parent_node_id, target_parent_path,
+        ms=int(time.time() * 1000), prefix=secrets.randbits(40)
+    )
+    await db.commit()
+    await render_cache.invalidate(db, target_department_id)
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("documents.clone", elapsed)
+    metrics.incr("documents.cloned", cloned)
+
+    new_path = f"{target_parent_path}{PATH_SEPARATOR}{new_root_id}" if target_parent_path else new_root_id
+    return {"msg": "Document cloned successfully", "node_id": new_root_id, "department_id": str(target_department_id), "path": new_path, "cloned": cloned, "seconds": round(elapsed, 3)}
+
+# Method to run a clone job with its own session; a job whose worker dies stays "running"
+async def _run_clone_job(job_id, department_id: str, node_id: str, target_department_id: str, target_parent_node_id: str | None):
+    async with AsyncSessionLocal() as db:
+        try:
+            await set_job_status(db, job_id, "running")
+            result = await _clone_document(db, department_id, node_id, target_department_id, target_parent_node_id)
+            await set_job_status(db, job_id, "done", result=result)
+        except Exception as e:
+            await db.rollback()
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            print("DOCUMENT CLONE FAILED:", job_id, error)
+            await set_job_status(db, job_id, "failed", error=error)
+
+# Method to clone a node and its subtree, optionally into another department; large subtrees
+# (or run_async) become a background job the client polls
+async def clone_document_usecase(db: AsyncSession, current_user: Principal, department_id: str, node_id: str, payload: CloneDocumentRequest):
+    target_department_id = str(payload.target_department_id or department_id)
+
+    # Step 1: The copy is a create in the target department
+    if not current_user.can("document.create", target_department_id):
+        raise HTTPException(403, "Permission denied")
+    if target_department_id != str(department_id) and await get_department(db, target_department_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Target department not found")
+
+    node = await get_node(db, department_id, node_id)
+    if node is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    # Step 2: Small subtrees are copied right away
+    nodes = await count_subtree(db, department_id, node.path)
+    if not payload.run_async and nodes <= CLONE_SYNC_MAX:
+        result = await _clone_document(db, department_id, node_id, target_department_id, payload.target_parent_node_id)
+        return JSONResponse(status_code=status.HTTP_201_CREATED, content=result)
+
+    # Step 3: Otherwise record a job and run it after the response
+    params = {"node_id": node_id, "target_department_id": target_department_id, "target_parent_node_id": payload.target_parent_node_id, "nodes": nodes}
+    job = await create_job(db, "clone", department_id, params)
+    task = asyncio.create_task(_run_clone_job(job.id, department_id, node_id, target_department_id, payload.target_parent_node_id))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"job_id": str(job.id), "status": job.status, "nodes": nodes})
+
+# Method to get the state of a background job
+async def get_job_usecase(db: AsyncSession, department_id: str, job_id):
+    job = await get_job(db, department_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    result = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": job.params,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+    return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(result))
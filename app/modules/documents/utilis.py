@@ -1,3 +1,4 @@
+import base64, binascii, json, math, re, uuid
 import ulid
 
 _monotonic_factory = ulid.monotonic
@@ -6,31 +7,198 @@ _monotonic_factory = ulid.monotonic
 def generate_ulid() -> str:
     return str(_monotonic_factory.new())
 
+# Utility to shape one node; `values` are the document columns picked by document_columns(fields)
+def node_payload(node_id: str, parent_node_id: str | None, path: str, values, fields: list[str] | None = None) -> dict:
+    if fields is None:
+        title, content = values
+        return {"node_id": node_id, "title": title, "content": content, "parent_node_id": parent_node_id, "children": []}
+
+    # Outline: no full content, only the requested sub-paths nested back under "content"
+    payload = {"node_id": node_id, "title": values[0], "parent_node_id": parent_node_id, "path": path, "children": []}
+    if fields:
+        content = {}
+        # fields never holds both a path and one of its ancestors (see _content_fields)
+        for field, value in zip(fields, values[1:]):
+            *parents, leaf = field.split(".")
+            target = content
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = value
+        payload["content"] = content
+    return payload
+
 # Utility to build a tree response
-def build_tree_response(rows):
+def build_tree_response(rows, fields: list[str] | None = None):
     if not rows:
         return None
 
     node_map = {}
 
     # Build dictionary
-    for node, document in rows:
-        node_map[node.node_id] = {
-            "node_id": node.node_id,
-            "title": document.title,
-            "content": document.content,
-            "parent_node_id": node.parent_node_id,
-            "children": []
-        }
+    for node_id, parent_node_id, path, *values in rows:
+        node_map[node_id] = node_payload(node_id, parent_node_id, path, values, fields)
 
     # The FIRST node in ordered rows is always the subtree root
-    root_node_id = rows[0][0].node_id
+    root_node_id = rows[0][0]
 
     # Attach children
-    for node, _ in rows:
-        if node.parent_node_id and node.parent_node_id in node_map:
-            node_map[node.parent_node_id]["children"].append(
-                node_map[node.node_id]
-            )
+    for node_id, parent_node_id, *_ in rows:
+        if parent_node_id and parent_node_id in node_map:
+            node_map[parent_node_id]["children"].append(node_map[node_id])
+
+    return node_map[root_node_id]
+
+# Utility to encode a batch of subtree rows as NDJSON
+def ndjson_lines(rows, fields: list[str] | None = None) -> str:
+    lines = []
+    for node_id, parent_node_id, path, *values in rows:
+        payload = node_payload(node_id, parent_node_id, path, values, fields)
+        del payload["children"]
+        lines.append(json.dumps(payload, default=str) + "\n")
+    return "".join(lines)
+
+
+# Utility to make an opaque keyset cursor from the sort key of the last item returned
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# Shape of a node id (ULID, Crockford base32) inside a cursor
+NODE_ID_RE = re.compile(r"^[0-9A-HJKMNP-TV-Z]{26}$")
+
+def _cursor_value_ok(value, kind) -> bool:
+    if isinstance(kind, re.Pattern):
+        return isinstance(value, str) and kind.fullmatch(value) is not None
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, float) and not math.isfinite(value):
+        return False
+    return isinstance(value, kind)
+
+# Utility to read a cursor back into its values; None when it is malformed or of another shape.
+# A type may be a compiled pattern (e.g. NODE_ID_RE) the value has to match as a string.
+def decode_cursor(cursor: str, *types):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    if not all(_cursor_value_ok(value, kind) for value, kind in zip(values, types)):
+        return None
+    return tuple(values)
+
+# Utility to build a depth=N tree; rows come in tree order and the (limit + 1)-th child only marks has_more
+def build_levels_response(rows, limit: int, fields: list[str] | None = None):
+    if not rows:
+        return None
+
+    node_map = {}
+    for node_id, parent_node_id, path, depth, rn, *values in rows:
+        if rn > limit:
+            parent = node_map[parent_node_id]
+            parent["has_more"] = True
+            parent["next_cursor"] = encode_cursor(parent_node_id, parent["children"][-1]["node_id"])
+            continue
+
+        node_map[node_id] = {**node_payload(node_id, parent_node_id, path, values, fields), "has_more": False, "next_cursor": None}
+        if depth > 0:
+            node_map[parent_node_id]["children"].append(node_map[node_id])
+
+    return node_map[rows[0][0]]
+
+
+# Assigns node ids and paths to imported nodes in memory; parents must come before their children
+class TreeImportPlanner:
+
+    def __init__(self, department_id, parent_node_id: str | None = None, parent_path: str | None = None, max_nodes: int | None = None):
+        self.department_id = department_id
+        self.parent_node_id = parent_node_id
+        self.parent_path = parent_path
+        self.max_nodes = max_nodes
+        self.count = 0
+        self.roots = []
+        self._placed = {}
+
+    def add(self, ref, parent_ref, title, content):
+        if not isinstance(title, str) or not 0 < len(title) <= 200:
+            raise ValueError(f"Node {self.count}: title must be a string of 1 to 200 characters")
+        if self.max_nodes is not None and self.count >= self.max_nodes:
+            raise ValueError(f"Import is limited to {self.max_nodes} nodes")
+
+        if parent_ref is None:
+            parent_node_id, parent_path = self.parent_node_id, self.parent_path
+        elif parent_ref in self._placed:
+            parent_node_id, parent_path = self._placed[parent_ref]
+        else:
+            raise ValueError(f"Node {self.count}: parent_ref {parent_ref!r} does not refer to an earlier node")
+
+        if ref in self._placed:
+            raise ValueError(f"Node {self.count}: duplicate ref {ref!r}")
+
+        node_id = generate_ulid()
+        path = f"{parent_path}.{node_id}" if parent_path else node_id
+        self._placed[ref] = (node_id, path)
+        if parent_ref is None:
+            self.roots.append(node_id)
+        self.count += 1
+
+        document_id = uuid.uuid4()
+        document = {"id": document_id, "title": title, "content": {} if content is None else content}
+        node = {"node_id": node_id, "document_id": document_id, "parent_node_id": parent_node_id, "department_id": self.department_id, "path": path}
+        return document, node
+
+# Utility to walk a nested import ({"nodes": [...]} or a bare list, each node with optional "children")
+# in pre-order, yielding (ref, parent_ref, title, content)
+async def nested_import_items(body):
+    roots = body.get("nodes") if isinstance(body, dict) else body
+    if not isinstance(roots, list):
+        raise ValueError("Expected a list of nodes or {\"nodes\": [...]}")
+
+    counter = 0
+    stack = [(node, None) for node in reversed(roots)]
+    while stack:
+        node, parent_ref = stack.pop()
+        if not isinstance(node, dict):
+            raise ValueError(f"Node {counter}: expected an object")
+        ref = counter
+        counter += 1
+        yield ref, parent_ref, node.get("title"), node.get("content")
+
+        children = node.get("children") or []
+        if not isinstance(children, list):
+            raise ValueError(f"Node {ref}: children must be a list")
+        stack.extend((child, ref) for child in reversed(children))
+
+# Utility to read an NDJSON import stream line by line; each line is
+# {"ref": ..., "parent_ref": ..., "title": ..., "content": ...}
+async def ndjson_import_items(chunks):
+    buffer = b""
+    line_number = 0
+
+    def parse(line):
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {line_number}: invalid JSON")
+        if not isinstance(item, dict):
+            raise ValueError(f"Line {line_number}: expected an object")
+        ref = item.get("ref")
+        ref = f"line:{line_number}" if ref is None else ref
+        parent_ref = item.get("parent_ref")
+        if not isinstance(ref, (str, int)) or not isinstance(parent_ref, (str, int, type(None))):
+            raise ValueError(f"Line {line_number}: ref and parent_ref must be strings or integers")
+        return ref, parent_ref, item.get("title"), item.get("content")
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield parse(line)
 
-    return node_map[root_node_id]
\ No newline at end of file
+    if buffer.strip():
+        line_number += 1
+        yield parse(buffer)
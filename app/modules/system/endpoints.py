@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+from app.db.debs import get_db
+from app.core.permission_dependancy import require_permission
+from app.core.principal import Principal
+from .usecases import get_metrics_usecase, reload_iam_policies_usecase
+
+# Router initialization
+router = APIRouter()
+
+# Dependencies
+db = Annotated[AsyncSession, Depends(get_db)]
+
+# Endpoint to get runtime metrics of this worker
+@router.get("/metrics")
+async def get_metrics_endpoint(current_user: Principal = Depends(require_permission("system.full_access"))):
+    resp = await get_metrics_usecase()
+    return resp
+
+# Endpoint to reload the IAM policy file into the database and every worker
+@router.post("/iam/reload")
+async def reload_iam_policies_endpoint(db: db, current_user: Principal = Depends(require_permission("system.full_access"))):
+    resp = await reload_iam_policies_usecase(db)
+    return resp
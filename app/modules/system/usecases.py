@@ -0,0 +1,14 @@
+from fastapi.responses import JSONResponse
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import metrics
+from app.core.iam_loader import reload_iam_policies
+
+# Method to get the in-process runtime metrics
+async def get_metrics_usecase():
+    return JSONResponse(status_code=status.HTTP_200_OK, content=metrics.snapshot())
+
+# Method to re-apply the IAM policy file without restarting the workers
+async def reload_iam_policies_usecase(db: AsyncSession):
+    diff = await reload_iam_policies(db)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"msg": "IAM policies reloaded", "changes": diff})
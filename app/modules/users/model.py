@@ -35,3 +35,10 @@ class UserRole(Base):
         UniqueConstraint("user_id", "role_id", "department_id", "group_id"),
     )
 
+# Per-user "not before" marker; access tokens issued before it are rejected
+class UserTokenRevocation(Base):
+    __tablename__ = "user_token_revocations"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    not_before: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
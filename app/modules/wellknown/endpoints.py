@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Request
+from .usecases import get_jwks_usecase
+
+# Router initialization
+router = APIRouter()
+
+# Endpoint to publish the token verification keys (JWKS)
+@router.get("/.well-known/jwks.json")
+async def get_jwks_endpoint(request: Request):
+    resp = await get_jwks_usecase(request)
+    return resp
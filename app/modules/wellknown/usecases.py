@@ -0,0 +1,18 @@
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from app.core.jwt.key_store import verification_keyring, JWKS_MAX_AGE
+from app.core.http_cache import etag_matches, not_modified
+
+# Method to serve the public signing keys with HTTP caching
+async def get_jwks_usecase(request: Request):
+    jwks, etag = verification_keyring.jwks()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={JWKS_MAX_AGE}",
+    }
+
+    # Conditional GET: the client's copy is still current
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(headers)
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content=jwks, headers=headers)
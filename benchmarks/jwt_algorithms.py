@@ -0,0 +1,53 @@
+# Benchmark: sign and verify throughput of the supported JWT signing algorithms
+#
+#   python -m benchmarks.jwt_algorithms [iterations]
+import json, sys, time
+from authlib.jose import jwt, JsonWebKey
+from app.core.jwt.key_store import KEY_TYPES
+
+AUD = "infintree"
+
+
+def _claims():
+    now = int(time.time())
+    return {
+        "sub": "bench",
+        "aud": AUD,
+        "iat": now,
+        "exp": now + 3600,
+        "roles": ["DEPARTMENT_MANAGER"],
+        "permissions": ["department.read", "document.create", "document.read", "document.update"],
+    }
+
+
+def _bench(alg, iterations):
+    kty, crv_or_size = KEY_TYPES[alg]
+    private = JsonWebKey.generate_key(kty, crv_or_size, is_private=True)
+    public = JsonWebKey.import_key(private.as_dict(False))
+    header = {"alg": alg, "kid": private.thumbprint()}
+    payload = _claims()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        token = jwt.encode(header, payload, private)
+    sign_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        jwt.decode(token, public).validate()
+    verify_s = time.perf_counter() - start
+
+    return {
+        "sign_per_s": round(iterations / sign_s),
+        "verify_per_s": round(iterations / verify_s),
+        "token_bytes": len(token),
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(json.dumps({alg: _bench(alg, iterations) for alg in KEY_TYPES}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
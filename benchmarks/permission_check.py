@@ -0,0 +1,68 @@
+# Benchmark: scoped permission check against the compiled matrix vs the legacy three-table join
+#
+#   python -m benchmarks.permission_check [iterations]
+#
+# The join is only measured when DB_HOST is set and the database holds a DEPARTMENT_MANAGER grant.
+import asyncio, json, os, sys, time, uuid
+from types import SimpleNamespace
+from sqlalchemy import select
+from app.core.permission_matrix import compile_permission_matrix
+from app.core.principal import Principal
+
+
+def _bench_matrix(iterations):
+    matrix = compile_permission_matrix()
+    department_id = str(uuid.uuid4())
+    other_department_id = str(uuid.uuid4())
+    user = SimpleNamespace(id=uuid.uuid4(), email="bench@infintree.io", user_type="DEPARTMENT_MANAGER")
+    grants = [("DEPARTMENT_MANAGER", department_id, None, code) for code in ("document.read", "document.create")]
+    principal = Principal.from_user(user, grants, matrix, {})
+
+    assert principal.can("document.read", department_id)
+    assert not principal.can("document.read", other_department_id)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        principal.can("document.read", department_id)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def _bench_join(iterations):
+    from app.db.session import AsyncSessionLocal
+    from app.modules.users.model import UserRole
+    from app.modules.permissions.model import Permission, RolePermission
+
+    async with AsyncSessionLocal() as db:
+        grant = await db.scalar(select(UserRole).limit(1))
+        if grant is None:
+            return None
+
+        stmt = (
+            select(UserRole)
+            .join(RolePermission, RolePermission.role_id == UserRole.role_id)
+            .join(Permission, Permission.id == RolePermission.permission_id)
+            .where(UserRole.user_id == grant.user_id, Permission.code == "document.read")
+        )
+        await db.scalar(stmt)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await db.scalar(stmt)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    result = {"matrix_us_per_check": round(_bench_matrix(iterations), 3)}
+
+    if os.getenv("DB_HOST"):
+        join_us = asyncio.run(_bench_join(min(iterations, 2000)))
+        if join_us is not None:
+            result["join_us_per_check"] = round(join_us, 1)
+            result["speedup"] = round(join_us / result["matrix_us_per_check"], 1)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
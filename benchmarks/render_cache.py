@@ -0,0 +1,65 @@
+# Micro-benchmark: rendering a depth=N response (tree assembly + JSON) vs serving it from the render cache
+#
+#   python -m benchmarks.render_cache [nodes] [iterations]
+#
+# Runs without a database on synthetic rows shaped like get_tree_levels() output, against the
+# in-process backend and the shared-backend stand-in.
+import json, sys, time
+from app.core.render_cache import RenderCache, LocalRenderBackend, SharedStandInBackend
+from app.modules.documents.utilis import build_levels_response
+
+FANOUT = 20
+
+
+# Method to build (node_id, parent_node_id, path, depth, rn, title, content) rows in tree order
+def _rows(count):
+    rows = [("ROOT", None, "ROOT", 0, 1, "root", {"body": "x" * 200})]
+    for i in range(count - 1):
+        parent = rows[i // FANOUT]
+        node_id = f"N{i:025d}"
+        rows.append((node_id, parent[0], f"{parent[2]}.{node_id}", parent[3] + 1, i % FANOUT + 1, f"doc {i}", {"body": "x" * 200}))
+    rows.sort(key=lambda row: row[2])
+    return rows
+
+
+def _render(rows):
+    result = build_levels_response(rows, FANOUT)
+    return json.dumps(result, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode()
+
+
+def _bench(cache, rows, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        body = _render(rows)
+    render_us = (time.perf_counter() - start) / iterations * 1e6
+
+    version = cache.version("department")
+    cache.put("department", version, "key", body)
+    assert cache.get("department", version, "key") == body
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cache.get("department", cache.version("department"), "key")
+    hit_us = (time.perf_counter() - start) / iterations * 1e6
+
+    cache.bump("department")
+    assert cache.get("department", cache.version("department"), "key") is None
+
+    return {"bytes": len(body), "render_us": round(render_us, 1), "hit_us": round(hit_us, 2), "speedup": round(render_us / hit_us, 1)}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rows = _rows(count)
+
+    result = {
+        "nodes": count,
+        "local": _bench(RenderCache(LocalRenderBackend()), rows, iterations),
+        "shared_stand_in": _bench(RenderCache(SharedStandInBackend()), rows, iterations),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# EXPLAIN check: the document tree queries must be served by the tree indexes
+#
+#   python -m benchmarks.tree_indexes [nodes]
+#
+# Needs DB_HOST. Seeds a synthetic department inside a transaction that is rolled back, plans
+# each repository query as a generic prepared statement (the way asyncpg reuses them) and fails
+# when a query falls back to a sequential scan of document_nodes or misses its tree index.
+# tests/test_tree_indexes.py runs the same check.
+import asyncio, json, os, sys, time, uuid
+from sqlalchemy import select, update, insert, func, text
+from app.modules.departments.model import Department
+from app.modules.documents.model import Document, DocumentNode
+from app.modules.documents.repository import subtree_filter, tree_path, tree_levels_stmt, move_subtree_stmt, restore_subtree_stmt, purge_batch_stmt, PATH_SEPARATOR
+from app.modules.documents.utilis import generate_ulid
+
+FANOUT = 10
+
+# Index each query has to use (besides never scanning document_nodes sequentially)
+EXPECTED_INDEXES = {
+    "tree_levels": ["idx_document_nodes_children"],
+    "subtree": ["idx_document_nodes_subtree"],
+    "soft_delete": ["idx_document_nodes_subtree"],
+    "move": ["idx_document_nodes_subtree", "idx_document_nodes_deleted_subtree"],
+    "restore": ["idx_document_nodes_deleted_subtree"],
+    "purge": ["idx_document_nodes_deleted_subtree"],
+}
+
+
+# Method to build a synthetic tree: FANOUT roots, FANOUT children per node, breadth first
+def _build_tree(department_id, count):
+    documents, nodes = [], []
+    frontier = [None]
+    while len(nodes) < count:
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(FANOUT):
+                if len(nodes) >= count:
+                    break
+                node_id = generate_ulid()
+                document_id = uuid.uuid4()
+                documents.append({"id": document_id, "title": f"doc {len(nodes)}", "content": {}})
+                nodes.append({
+                    "node_id": node_id,
+                    "document_id": document_id,
+                    "parent_node_id": parent["node_id"] if parent else None,
+                    "department_id": department_id,
+                    "path": f"{parent['path']}{PATH_SEPARATOR}{node_id}" if parent else node_id,
+                })
+                next_frontier.append(nodes[-1])
+        frontier = next_frontier
+    return documents, nodes
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+# Method to plan a statement as a generic prepared statement and report the scans on document_nodes
+async def _explain(conn, name, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    args = ", ".join(_literal(compiled.params[key]) for key in compiled.positiontup)
+
+    # Simple query protocol, so the $n placeholders belong to PREPARE itself
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.execute(f"PREPARE tree_check AS {compiled}")
+    try:
+        plan = await raw.fetchval(f"EXPLAIN (FORMAT JSON) EXECUTE tree_check({args})")
+        plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+        start = time.perf_counter()
+        await raw.execute(f"EXPLAIN ANALYZE EXECUTE tree_check({args})")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        await raw.execute("DEALLOCATE tree_check")
+
+    scans = [
+        (node["Node Type"], node.get("Index Name"))
+        for node in _plan_nodes(plan)
+        if node.get("Relation Name") == DocumentNode.__tablename__
+    ]
+    # Bitmap Index Scan nodes carry the index name but not the relation
+    indexes = sorted({node["Index Name"] for node in _plan_nodes(plan) if node.get("Index Name")})
+    ok = all(kind != "Seq Scan" for kind, _ in scans) and all(index in indexes for index in EXPECTED_INDEXES[name])
+    return {"query": name, "scans": scans, "indexes": indexes, "ms": round(elapsed_ms, 2), "ok": ok}
+
+
+# Method to plan every tree query over a synthetic department of `count` nodes
+async def check_tree_indexes(count):
+    from app.db.session import engine
+
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            department_id = uuid.uuid4()
+            await conn.execute(insert(Department).values(id=department_id, name=f"tree-check-{department_id}"))
+
+            documents, nodes = _build_tree(department_id, count)
+            await conn.execute(insert(Document), documents)
+            await conn.execute(insert(DocumentNode), nodes)
+            await conn.execute(text("ANALYZE document_nodes"))
+            await conn.execute(text("SET LOCAL plan_cache_mode = force_generic_plan"))
+
+            # A second-level node: a subtree of a few hundred rows out of the whole department
+            probe = nodes[FANOUT]
+            moved_path = f"{nodes[1]['path']}{PATH_SEPARATOR}{probe['node_id']}"
+            now = func.now()
+            deleted_nodes = (
+                update(DocumentNode)
+                .where(*subtree_filter(department_id, probe["path"]))
+                .values(deleted_at=now)
+                .returning(DocumentNode.document_id)
+                .cte("deleted_nodes")
+            )
+            queries = {
+                "tree_levels": tree_levels_stmt(department_id, probe["node_id"], 2, 5),
+                "subtree": (
+                    select(DocumentNode, Document)
+                    .join(Document, Document.id == DocumentNode.document_id)
+                    .where(*subtree_filter(department_id, probe["path"]))
+                    .order_by(tree_path)
+                ),
+                "soft_delete": (
+                    update(Document)
+                    .where(Document.id.in_(select(deleted_nodes.c.document_id)))
+                    .values(deleted_at=now)
+                ),
+                # Runs after soft_delete, so it walks the deleted-rows index as well
+                "move": move_subtree_stmt(department_id, probe["node_id"], probe["path"], moved_path, nodes[1]["node_id"]),
+                # The subtree was deleted at now() of this same transaction
+                "restore": restore_subtree_stmt(department_id, moved_path, now),
+                "purge": purge_batch_stmt(now + text("interval '1 second'"), 100),
+            }
+
+            return [await _explain(conn, name, stmt) for name, stmt in queries.items()]
+        finally:
+            await trans.rollback()
+
+
+def main():
+    if not os.getenv("DB_HOST"):
+        print("DB_HOST is not set; the tree index check needs a database")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = asyncio.run(check_tree_indexes(count))
+    print(json.dumps({"nodes": count, "queries": results}, indent=2))
+
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Micro-benchmark: verify_token latency with the old per-request key load, the in-memory keyring
+# and the verified-claims cache
+#
+#   python -m benchmarks.verify_latency [iterations]
+import os, sys, json, tempfile, time
+from pathlib import Path
+
+os.environ.setdefault("KEYS_FILE", str(Path(tempfile.mkdtemp()) / "keys.json"))
+
+from authlib.jose import jwt, JsonWebKey
+from app.core.jwt.key_store import get_active_key, get_jwks
+from app.core.jwt.verifier import verify_token, LEEWAY
+from app.core.jwt.claims_cache import claims_cache
+from app.core.security import decode_jwt_header
+
+AUD = "infintree"
+
+
+# Previous implementation: read keys.json and re-import the JWK on every call
+def verify_token_uncached(token: str, aud: str):
+    header = decode_jwt_header(token)
+    jwks = get_jwks()
+    jwk_dict = next(k for k in jwks["keys"] if k["kid"] == header["kid"])
+    key = JsonWebKey.import_key(jwk_dict)
+    claims = jwt.decode(
+        token,
+        key,
+        claims_options={"exp": {"essential": True}, "aud": {"essential": True, "value": aud}},
+        claims_params={"leeway": LEEWAY}
+    )
+    claims.validate()
+    return dict(claims)
+
+
+def _sign():
+    kid, key, alg = get_active_key()
+    now = int(time.time())
+    payload = {"sub": "bench", "aud": AUD, "iat": now, "exp": now + 3600}
+    return jwt.encode({"alg": alg, "kid": kid}, payload, key).decode()
+
+
+def _measure(fn, token, iterations):
+    fn(token, AUD)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(token, AUD)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    token = _sign()
+
+    before = _measure(verify_token_uncached, token, iterations)
+
+    cache_size, claims_cache.max_size = claims_cache.max_size, 0
+    after = _measure(verify_token, token, iterations)
+    claims_cache.max_size = cache_size
+
+    cached = _measure(verify_token, token, iterations)
+
+    print(json.dumps({
+        "iterations": iterations,
+        "uncached_us_per_verify": round(before, 1),
+        "keyring_us_per_verify": round(after, 1),
+        "claims_cache_us_per_verify": round(cached, 1),
+        "speedup": round(before / after, 2),
+        "cached_speedup": round(before / cached, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
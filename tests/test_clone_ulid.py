@@ -0,0 +1,67 @@
+# The infintree_ulid SQL is mirrored in Python and checked against the ulid library and
+# generate_ulid ordering; with a database (DB_HOST) the real function is checked too.
+import os, secrets, time, unittest
+import ulid
+from app.modules.documents.utilis import generate_ulid, NODE_ID_RE
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+# Same arithmetic as the SQL function, character by character
+def _infintree_ulid(ms: int, prefix: int, seq: int) -> str:
+    chars = []
+    for i in range(26):
+        value, last = (ms, 9) if i < 10 else (prefix, 17) if i < 18 else (seq, 25)
+        chars.append(CROCKFORD[(value >> (5 * (last - i))) & 31])
+    return "".join(chars)
+
+
+class CloneUlidTest(unittest.TestCase):
+
+    def test_matches_the_ulid_bit_layout(self):
+        for ms, prefix, seq in [(0, 0, 0), (1, 2, 3), (2**48 - 1, 2**40 - 1, 2**40 - 1), (1760000000000, secrets.randbits(40), 31)]:
+            with self.subTest(ms=ms, prefix=prefix, seq=seq):
+                node_id = _infintree_ulid(ms, prefix, seq)
+                self.assertRegex(node_id, NODE_ID_RE)
+                self.assertEqual(node_id, str(ulid.from_int((ms << 80) | (prefix << 40) | seq)))
+                self.assertEqual(ulid.parse(node_id).timestamp().int, ms)
+
+    def test_ids_sort_in_sequence_order(self):
+        ms, prefix = int(time.time() * 1000), secrets.randbits(40)
+        ids = [_infintree_ulid(ms, prefix, seq) for seq in [1, 2, 31, 32, 33, 1023, 1024, 2**20, 2**40 - 1]]
+        self.assertEqual(sorted(ids), ids)
+
+    def test_ids_sort_between_generate_ulid_values_by_time(self):
+        before = generate_ulid()
+        time.sleep(0.002)
+        ms = int(time.time() * 1000)
+        cloned = [_infintree_ulid(ms, secrets.randbits(40), seq) for seq in (1, 2**40 - 1)]
+        time.sleep(0.002)
+        after = generate_ulid()
+
+        for node_id in cloned:
+            self.assertLess(before, node_id)
+            self.assertLess(node_id, after)
+
+
+@unittest.skipUnless(os.getenv("DB_HOST"), "DB_HOST is not set; the SQL check needs a database")
+class CloneUlidSqlTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sql_function_matches_the_mirror(self):
+        from sqlalchemy import text
+        from app.db.session import engine, init_db
+
+        cases = [(0, 0, 0), (1760000000000, secrets.randbits(40), 1), (2**48 - 1, 2**40 - 1, 2**40 - 1)]
+        try:
+            await init_db()
+            async with engine.connect() as conn:
+                for ms, prefix, seq in cases:
+                    with self.subTest(ms=ms, prefix=prefix, seq=seq):
+                        node_id = await conn.scalar(text("SELECT infintree_ulid(:ms, :prefix, :seq)"), {"ms": ms, "prefix": prefix, "seq": seq})
+                        self.assertEqual(node_id, _infintree_ulid(ms, prefix, seq))
+        finally:
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
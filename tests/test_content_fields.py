@@ -0,0 +1,45 @@
+import os, unittest
+from fastapi import HTTPException
+
+# The engine is built when the documents module is imported; nothing connects in these tests
+os.environ.setdefault("DB_PORT", "5432")
+
+from app.modules.documents.usecases import _content_fields, MAX_CONTENT_FIELDS
+from app.modules.documents.utilis import node_payload
+
+
+class ContentFieldsTest(unittest.TestCase):
+
+    def test_defaults_depend_on_view(self):
+        self.assertIsNone(_content_fields("full", None))
+        self.assertEqual(_content_fields("outline", None), [])
+
+    def test_blank_names_and_whitespace_are_dropped(self):
+        self.assertEqual(_content_fields("outline", " meta , ,summary,"), ["meta", "summary"])
+
+    def test_duplicates_are_dropped_keeping_first_order(self):
+        self.assertEqual(_content_fields("outline", "summary,meta,summary"), ["summary", "meta"])
+
+    def test_broader_field_wins_in_either_order(self):
+        self.assertEqual(_content_fields("outline", "meta.tags,meta"), ["meta"])
+        self.assertEqual(_content_fields("outline", "meta,meta.tags"), ["meta"])
+        self.assertEqual(_content_fields("outline", "meta.a.b,summary,meta.a"), ["summary", "meta.a"])
+
+    def test_sibling_prefixes_are_not_ancestors(self):
+        self.assertEqual(_content_fields("outline", "meta,metadata.x"), ["meta", "metadata.x"])
+
+    def test_rejects_invalid_names_and_too_many_fields(self):
+        for fields in ["meta..tags", "meta;drop", ",".join(f"f{i}" for i in range(MAX_CONTENT_FIELDS + 1))]:
+            with self.subTest(fields=fields):
+                with self.assertRaises(HTTPException) as caught:
+                    _content_fields("outline", fields)
+                self.assertEqual(caught.exception.status_code, 400)
+
+    def test_normalised_fields_nest_back_into_content(self):
+        fields = _content_fields("outline", "meta.tags,summary,meta.tags")
+        payload = node_payload("N", None, "N", ["Title", ["a"], "short"], fields)
+        self.assertEqual(payload["content"], {"meta": {"tags": ["a"]}, "summary": "short"})
+
+
+if __name__ == "__main__":
+    unittest.main()
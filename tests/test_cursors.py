@@ -0,0 +1,52 @@
+import base64, json, unittest
+from app.modules.documents.utilis import encode_cursor, decode_cursor, generate_ulid, NODE_ID_RE
+
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_children_cursor_round_trip(self):
+        parent, child = generate_ulid(), generate_ulid()
+        self.assertEqual(decode_cursor(encode_cursor(parent, child), NODE_ID_RE, NODE_ID_RE), (parent, child))
+
+    def test_search_cursor_round_trip(self):
+        node_id = generate_ulid()
+        self.assertEqual(decode_cursor(encode_cursor(0.25, node_id), (int, float), NODE_ID_RE), (0.25, node_id))
+        self.assertEqual(decode_cursor(encode_cursor(0, node_id), (int, float), NODE_ID_RE), (0, node_id))
+
+    def test_cursor_is_url_safe_without_padding(self):
+        cursor = encode_cursor(generate_ulid(), generate_ulid())
+        self.assertNotIn("=", cursor)
+        self.assertTrue(all(c.isalnum() or c in "-_" for c in cursor))
+
+    def test_rejects_garbage(self):
+        for cursor in ["", "!!!", "not-base64", _raw_cursor({"a": 1})[:-2] + "$$"]:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor, NODE_ID_RE, NODE_ID_RE))
+
+    def test_rejects_wrong_shape(self):
+        node_id = generate_ulid()
+        self.assertIsNone(decode_cursor(_raw_cursor({"a": node_id}), NODE_ID_RE))
+        self.assertIsNone(decode_cursor(_raw_cursor([node_id]), NODE_ID_RE, NODE_ID_RE))
+        self.assertIsNone(decode_cursor(_raw_cursor([node_id, node_id, node_id]), NODE_ID_RE, NODE_ID_RE))
+
+    def test_rejects_values_that_are_not_node_ids(self):
+        node_id = generate_ulid()
+        for bad in ["x" * 26, "' OR 1=1 --              ", node_id.lower(), node_id[:-1] + "U", node_id + "0", 12345]:
+            with self.subTest(bad=bad):
+                self.assertIsNone(decode_cursor(_raw_cursor([node_id, bad]), NODE_ID_RE, NODE_ID_RE))
+
+    def test_rejects_non_numeric_or_non_finite_rank(self):
+        node_id = generate_ulid()
+        for rank in ["0.5", True, None]:
+            with self.subTest(rank=rank):
+                self.assertIsNone(decode_cursor(_raw_cursor([rank, node_id]), (int, float), NODE_ID_RE))
+        nan_cursor = base64.urlsafe_b64encode(f'[NaN, "{node_id}"]'.encode()).decode()
+        self.assertIsNone(decode_cursor(nan_cursor, (int, float), NODE_ID_RE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio, json, unittest
+from app.modules.documents.utilis import TreeImportPlanner, nested_import_items, ndjson_import_items, generate_ulid
+
+DEPARTMENT_ID = "7b0c2a1e-0000-4000-8000-000000000001"
+
+
+async def _collect(items):
+    return [item async for item in items]
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+class TreeImportPlannerTest(unittest.TestCase):
+
+    def test_children_get_paths_under_their_parent(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        _, root = planner.add("a", None, "Root", None)
+        _, child = planner.add("b", "a", "Child", None)
+        _, grandchild = planner.add("c", "b", "Grandchild", None)
+
+        self.assertEqual(root["path"], root["node_id"])
+        self.assertEqual(child["parent_node_id"], root["node_id"])
+        self.assertEqual(child["path"], f"{root['path']}.{child['node_id']}")
+        self.assertEqual(grandchild["path"], f"{child['path']}.{grandchild['node_id']}")
+        self.assertEqual(planner.roots, [root["node_id"]])
+        self.assertEqual(planner.count, 3)
+
+    def test_roots_go_under_the_import_parent(self):
+        parent_id = generate_ulid()
+        planner = TreeImportPlanner(DEPARTMENT_ID, parent_id, f"ROOT.{parent_id}")
+        document, node = planner.add(0, None, "Top", {"k": 1})
+
+        self.assertEqual(node["parent_node_id"], parent_id)
+        self.assertEqual(node["path"], f"ROOT.{parent_id}.{node['node_id']}")
+        self.assertEqual(node["document_id"], document["id"])
+        self.assertEqual(document["content"], {"k": 1})
+
+    def test_rejects_unknown_parent_ref(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        with self.assertRaisesRegex(ValueError, "does not refer to an earlier node"):
+            planner.add("a", "missing", "Orphan", None)
+
+    def test_rejects_child_listed_before_its_parent(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        with self.assertRaisesRegex(ValueError, "does not refer to an earlier node"):
+            planner.add("child", "parent", "Child", None)
+        self.assertEqual(planner.count, 0)
+
+    def test_rejects_duplicate_ref(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        planner.add("a", None, "First", None)
+        with self.assertRaisesRegex(ValueError, "duplicate ref"):
+            planner.add("a", None, "Second", None)
+
+    def test_rejects_bad_titles(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        for title in [None, "", "x" * 201, 42]:
+            with self.subTest(title=title):
+                with self.assertRaisesRegex(ValueError, "title"):
+                    planner.add("a", None, title, None)
+
+    def test_enforces_node_cap(self):
+        planner = TreeImportPlanner(DEPARTMENT_ID, max_nodes=2)
+        planner.add(0, None, "One", None)
+        planner.add(1, 0, "Two", None)
+        with self.assertRaisesRegex(ValueError, "limited to 2 nodes"):
+            planner.add(2, 1, "Three", None)
+
+
+class ImportItemsTest(unittest.TestCase):
+
+    def test_nested_items_come_in_pre_order_with_parent_refs(self):
+        body = {"nodes": [
+            {"title": "A", "children": [{"title": "A1"}, {"title": "A2", "children": [{"title": "A2a"}]}]},
+            {"title": "B"},
+        ]}
+        items = asyncio.run(_collect(nested_import_items(body)))
+        self.assertEqual(
+            [(ref, parent_ref, title) for ref, parent_ref, title, _ in items],
+            [(0, None, "A"), (1, 0, "A1"), (2, 0, "A2"), (3, 2, "A2a"), (4, None, "B")],
+        )
+
+    def test_nested_items_feed_the_planner(self):
+        body = [{"title": "A", "children": [{"title": "A1"}]}]
+        planner = TreeImportPlanner(DEPARTMENT_ID)
+        nodes = [planner.add(*item)[1] for item in asyncio.run(_collect(nested_import_items(body)))]
+        self.assertEqual(nodes[1]["parent_node_id"], nodes[0]["node_id"])
+
+    def test_nested_items_reject_bad_shapes(self):
+        for body in [{"nodes": "x"}, ["not an object"], [{"title": "A", "children": "x"}]]:
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    asyncio.run(_collect(nested_import_items(body)))
+
+    def test_ndjson_lines_split_across_chunks(self):
+        lines = [
+            {"ref": "a", "title": "A"},
+            {"ref": "b", "parent_ref": "a", "title": "B"},
+            {"title": "C", "parent_ref": "b"},
+        ]
+        raw = "\n".join(json.dumps(line) for line in lines).encode()
+        items = asyncio.run(_collect(ndjson_import_items(_chunks(raw[:10], raw[10:33], b"", raw[33:]))))
+        self.assertEqual(
+            [(ref, parent_ref, title) for ref, parent_ref, title, _ in items],
+            [("a", None, "A"), ("b", "a", "B"), ("line:3", "b", "C")],
+        )
+
+    def test_ndjson_rejects_bad_lines(self):
+        for raw in [b"{not json}\n", b"[1, 2]\n", b'{"ref": [1], "title": "A"}\n']:
+            with self.subTest(raw=raw):
+                with self.assertRaisesRegex(ValueError, "Line 1"):
+                    asyncio.run(_collect(ndjson_import_items(_chunks(raw))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from app.core import permission_matrix
+from app.core.permission_matrix import PermissionMatrix, decode_permission_bits, FULL_ACCESS
+
+
+def _policies(codes, roles=None) -> dict:
+    return {
+        "permissions": [{"code": code} for code in codes],
+        "roles": roles or {},
+    }
+
+
+CODES = [FULL_ACCESS, "document.create", "document.read", "document.update", "user.read"]
+ROLES = {
+    "editor": {"scope": "department", "permissions": ["document.*"]},
+    "viewer": {"scope": "department", "permissions": ["document.read"]},
+}
+
+
+class PermissionBitsTest(unittest.TestCase):
+
+    def setUp(self):
+        self._saved = dict(permission_matrix._matrices_by_version)
+        permission_matrix._matrices_by_version.clear()
+        decode_permission_bits.cache_clear()
+
+    def tearDown(self):
+        permission_matrix._matrices_by_version.clear()
+        permission_matrix._matrices_by_version.update(self._saved)
+        decode_permission_bits.cache_clear()
+
+    def _register(self, matrix: PermissionMatrix) -> PermissionMatrix:
+        permission_matrix._matrices_by_version[matrix.version] = matrix
+        return matrix
+
+    def test_round_trip_in_the_same_layout(self):
+        matrix = self._register(PermissionMatrix(_policies(CODES, ROLES)))
+        codes = {"document.read", "user.read"}
+        mask, decoded = decode_permission_bits(matrix.version, matrix.encode(codes), (), matrix)
+        self.assertEqual(decoded, frozenset(codes))
+        self.assertEqual(mask, matrix.mask_of(codes))
+
+    def test_encoding_is_url_safe_and_unpadded(self):
+        matrix = PermissionMatrix(_policies([f"p.{i}" for i in range(40)]))
+        bits = matrix.encode(matrix.codes)
+        self.assertNotIn("=", bits)
+        self.assertTrue(all(c.isalnum() or c in "-_" for c in bits))
+        self.assertEqual(matrix.encode([]), "AA")
+
+    def test_unknown_codes_are_not_encoded(self):
+        matrix = self._register(PermissionMatrix(_policies(CODES)))
+        _, decoded = decode_permission_bits(matrix.version, matrix.encode(["document.read", "nope"]), (), matrix)
+        self.assertEqual(decoded, frozenset({"document.read"}))
+
+    def test_old_layout_is_remapped_to_the_current_one(self):
+        old = self._register(PermissionMatrix(_policies(CODES)))
+        current = self._register(PermissionMatrix(_policies(["group.read"] + list(reversed(CODES)))))
+        self.assertNotEqual(old.version, current.version)
+
+        mask, decoded = decode_permission_bits(old.version, old.encode({"document.update"}), (), current)
+        self.assertEqual(decoded, frozenset({"document.update"}))
+        self.assertEqual(mask, current.bit("document.update"))
+
+    def test_full_access_expands_to_every_bit(self):
+        matrix = self._register(PermissionMatrix(_policies(CODES)))
+        mask, _ = decode_permission_bits(matrix.version, matrix.encode({FULL_ACCESS}), (), matrix)
+        self.assertEqual(mask, matrix.all_bits)
+
+    def test_unknown_version_falls_back_to_roles(self):
+        current = PermissionMatrix(_policies(CODES, ROLES))
+        mask, decoded = decode_permission_bits("deadbeef", "_w", ("editor", "missing"), current)
+        self.assertEqual(decoded, frozenset({"document.create", "document.read", "document.update"}))
+        self.assertEqual(mask, current.role_masks["editor"])
+
+        mask, decoded = decode_permission_bits("deadbeef", "_w", (), current)
+        self.assertEqual((mask, decoded), (0, frozenset()))
+
+
+if __name__ == "__main__":
+    unittest.main()
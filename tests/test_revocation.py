@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timezone
+from app.core import revocation
+from app.core.revocation import is_token_revoked, token_issued_at_ms
+
+USER_ID = "7b0c2a1e-0000-4000-8000-000000000001"
+REVOKED_AT = datetime(2026, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+
+
+def _claims(seconds_after_revocation: float) -> dict:
+    issued = REVOKED_AT.timestamp() + seconds_after_revocation
+    return {"sub": USER_ID, "iat": int(issued), "iat_ms": int(issued * 1000)}
+
+
+class RevocationTest(unittest.TestCase):
+
+    def setUp(self):
+        revocation._not_before.clear()
+        revocation._remember(USER_ID, REVOKED_AT)
+
+    def tearDown(self):
+        revocation._not_before.clear()
+
+    def test_token_issued_after_revocation_in_the_same_second_is_accepted(self):
+        claims = _claims(0.2)
+        self.assertEqual(claims["iat"], int(REVOKED_AT.timestamp()))
+        self.assertFalse(is_token_revoked(USER_ID, token_issued_at_ms(claims)))
+
+    def test_token_issued_before_revocation_is_rejected(self):
+        self.assertTrue(is_token_revoked(USER_ID, token_issued_at_ms(_claims(-0.2))))
+        self.assertTrue(is_token_revoked(USER_ID, token_issued_at_ms(_claims(-600))))
+
+    def test_token_issued_in_a_later_second_is_accepted(self):
+        self.assertFalse(is_token_revoked(USER_ID, token_issued_at_ms(_claims(1))))
+
+    def test_token_without_iat_ms_from_the_revocation_second_is_rejected(self):
+        claims = _claims(0.2)
+        del claims["iat_ms"]
+        self.assertTrue(is_token_revoked(USER_ID, token_issued_at_ms(claims)))
+
+    def test_other_users_are_not_affected(self):
+        self.assertFalse(is_token_revoked("someone-else", token_issued_at_ms(_claims(-600))))
+
+    def test_an_older_marker_does_not_replace_a_newer_one(self):
+        revocation._remember(USER_ID, datetime(2025, 1, 1, tzinfo=timezone.utc))
+        self.assertTrue(is_token_revoked(USER_ID, token_issued_at_ms(_claims(-0.2))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+# Plan check for the document tree queries; needs a database (DB_HOST), skipped otherwise.
+#
+#   python -m unittest tests.test_tree_indexes      (or: python -m pytest tests)
+import os, unittest
+
+TREE_CHECK_NODES = int(os.getenv("TREE_CHECK_NODES", 5000))
+
+
+@unittest.skipUnless(os.getenv("DB_HOST"), "DB_HOST is not set; the tree index check needs a database")
+class TreeIndexTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_tree_queries_use_the_collate_c_indexes(self):
+        from app.db.session import engine, init_db
+        from benchmarks.tree_indexes import check_tree_indexes, EXPECTED_INDEXES
+
+        try:
+            await init_db()
+            results = await check_tree_indexes(TREE_CHECK_NODES)
+        finally:
+            await engine.dispose()
+
+        self.assertEqual({r["query"] for r in results}, set(EXPECTED_INDEXES))
+        for result in results:
+            with self.subTest(query=result["query"]):
+                self.assertNotIn("Seq Scan", [kind for kind, _ in result["scans"]])
+                for index in EXPECTED_INDEXES[result["query"]]:
+                    self.assertIn(index, result["indexes"])